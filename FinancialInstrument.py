@@ -4,35 +4,76 @@
 # Analyzing financial instruments
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import yfinance as yf
-plt.style.use('seaborn')
+from src.Data.Price_Cache import prices_cache
+from src.Plotting.Plot_Style import pyplot
+
+PERIODS_PER_YEAR = {'B': 252, 'C': 252, 'D': 252, 'W': 52, 'SM': 24, 'SMS': 24, 'M': 12, 'ME': 12, 'MS': 12,
+                    'BM': 12, 'BME': 12, 'BMS': 12, 'Q': 4, 'QE': 4, 'QS': 4, 'BQ': 4, 'BQE': 4, 'BQS': 4,
+                    'A': 1, 'Y': 1, 'YE': 1, 'AS': 1, 'YS': 1, 'BA': 1, 'BY': 1, 'BYE': 1, 'BYS': 1}
+
+
+def periods_per_year(freq = None):
+    ''' Number of periods per year of a resampling frequency (None = daily data, 252 trading days)
+    '''
+    if freq is None:
+        return 252
+    offset = pd.tseries.frequencies.to_offset(freq)
+    base = offset.rule_code.split('-')[0]
+    if base in PERIODS_PER_YEAR:
+        return PERIODS_PER_YEAR[base] / offset.n
+    return 252 * pd.Timedelta(days = 1) / pd.Timedelta(offset) # intraday frequencies
 
 
 class FinancialInstrument():
     ''' Class to analyze any kind of financial instruments
     '''
-    def __init__(self, ticker, start, end):
+    def __init__(self, ticker, start, end, cache = None):
         self._ticker = ticker # _ticker => protected attribute though we can call it with _ticker instead of ticker
         self.start = start
         self.end = end
-        self.get_data()
-        self.log_returns()
+        self.cache = cache or prices_cache # on-disk price cache, its downloader can be replaced for tests
+        self._data = None # prices are only retrieved on first access to "data"
+    
+    @classmethod
+    def batch(cls, tickers, start, end, cache = None, **kwargs):
+        ''' Creates one instance per ticker, retrieving the prices of all tickers in a single request
+        '''
+        cache = cache or prices_cache
+        prices = cache.load(tickers, start, end)
+        instruments = {}
+        for ticker in tickers:
+            instrument = cls(ticker, start, end, cache = cache, **kwargs)
+            instrument.get_data(prices[ticker])
+            instrument.log_returns()
+            instruments[ticker] = instrument
+        return instruments
+    
+    @property
+    def data(self):
+        if self._data is None:
+            self.get_data()
+            self.log_returns()
+        return self._data
+    
+    @data.setter
+    def data(self, data):
+        self._data = data
     
     def set_ticker(self, ticker = None):
         if ticker is not None:
             self._ticker = ticker
-            self.get_data()
-            self.log_returns()
+            self._data = None # retrieved again on next access
         
     def __repr__(self):
         return 'FinancialInstrument(ticker = {}, start = {}, end = {})'.format(self._ticker, self.start, self.end)
         
-    def get_data(self):
-        ''' Retrieves and prepares data from Yahoo Finance
+    def get_data(self, prices = None):
+        ''' Retrieves and prepares data from Yahoo Finance (through the price cache) unless the
+            close prices are given ("prices")
         '''
-        raw_data = yf.download(self._ticker, self.start, self.end).Close.to_frame()
-        raw_data.rename(columns = {'Close': 'Price'}, inplace = True)
+        if prices is None:
+            prices = self.cache.load(self._ticker, self.start, self.end)[self._ticker]
+        raw_data = prices.dropna().to_frame('Price')
         # Make it an attriute
         self.data = raw_data
         
@@ -44,12 +85,14 @@ class FinancialInstrument():
     def plot_prices(self): 
         ''' Creates a price chart
         '''
+        plt = pyplot()
         self.data.plot(figsize = (12, 8))
         plt.title('Price chart: {}'.format(self._ticker), fontsize = 15)
         
     def plot_returns(self, kind = 'ts'): # Either you plot the time series or the histogram
         ''' Schemes logarithmic returns either as time series ("ts") or histograms ("hist")
         '''
+        plt = pyplot()
         if kind == 'ts':
             self.data.Log_returns.plot(figsize = (12, 8))
             plt.title('Returns: {}'.format(self._ticker), fontsize = 15)
@@ -60,37 +103,73 @@ class FinancialInstrument():
 
 class RiskReturn(FinancialInstrument):
     
-    def __init__(self, ticker, start, end, freq = None):
-        super().__init__(ticker, start, end)
+    def __init__(self, ticker, start, end, freq = None, cache = None):
+        super().__init__(ticker, start, end, cache)
         self.freq = freq
     
+    def get_data(self, prices = None):
+        super().get_data(prices)
+        self._resampled = {} # resampled prices and returns per frequency
+    
     def __repr__(self):
         return 'RiskReturn(ticker = {}, start = {}, end = {})'.format(self._ticker, self.start, self.end)
     
+    def resampled(self, freq = None):
+        ''' Returns the prices and logarithmic returns on a given frequency ("freq"), cached per frequency
+        '''
+        data = self.data # retrieves the prices on first use
+        if freq not in self._resampled:
+            if freq is None:
+                price = data.Price.dropna().values
+            else:
+                price = data.Price.resample(freq).last().dropna().values # Resample the prices according to the frequence
+            returns = np.log(price[1:] / price[:-1]) # Re-compute returns with the resampled prices
+            self._resampled[freq] = (price, returns)
+        return self._resampled[freq]
+    
+    def statistics(self, freq = None):
+        ''' Computes mean, std, annualized return and risk, skew and maximum drawdown on a given frequency ("freq")
+        '''
+        price, returns = self.resampled(freq)
+        n = len(returns)
+        # power sums of the returns in a single pass
+        s1, s2, s3 = (returns[:, None] ** np.arange(1, 4)).sum(axis = 0) if n else (0, 0, 0)
+        mean = s1 / n if n else np.nan
+        m2 = s2 / n - mean ** 2 if n else np.nan # central moments
+        m3 = s3 / n - 3 * mean * s2 / n + 2 * mean ** 3 if n else np.nan
+        std = np.sqrt(max(m2, 0) * n / (n - 1)) if n > 1 else np.nan
+        # adjusted Fisher-Pearson skewness, as pd.Series.skew()
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5 if n > 2 and m2 > 0 else np.nan
+        periods = periods_per_year(freq)
+        return {
+            'mean': mean,
+            'std': std,
+            'ann_return': mean * periods,
+            'ann_risk': std * np.sqrt(periods),
+            'skew': skew,
+            'max_drawdown': (1 - price / np.maximum.accumulate(price)).max() if len(price) else np.nan,
+            'observations': n,
+        }
+    
+    def summary(self, freqs = (None, 'W', 'ME', 'QE', 'YE')):
+        ''' Computes the statistics for a list of frequencies ("freqs") in one call
+        '''
+        return pd.DataFrame([self.statistics(freq) for freq in freqs], index = [freq or 'data' for freq in freqs])
+    
     def mean_return(self): 
         ''' Computes the mean of returns on a given frequency ("freq")
         '''
-        if self.freq is None:
-            return self.data.Log_returns.mean()
-        else:
-            resampled_price = self.data.Price.resample(self.freq).last() # Resample the prices according to the frequence
-            resampled_returns = np.log(resampled_price / resampled_price.shift(1)) # Resample/Re-compute returns with the resampled prices
-            return resampled_returns.mean()
+        return self.statistics(self.freq)['mean']
         
     def std_return(self): 
         ''' Computes the standard deviation of returns according to a given frequency ("freq")
         '''
-        if self.freq is None:
-            return self.data.Log_returns.std()
-        else:
-            resampled_price = self.data.Price.resample(self.freq).last() # Resample the prices according to the frequence
-            resampled_returns = np.log(resampled_price / resampled_price.shift(1)) # Resample/Re-compute returns with the resampled prices
-            return resampled_returns.std()
+        return self.statistics(self.freq)['std']
     
     def annualized_perf(self):
-        ''' Computes the annualized return and risk
+        ''' Computes the annualized return and risk on the given frequency ("freq")
         '''
-        mean_return = round(self.data.Log_returns.mean() * 252, 3)
-        risk = round(self.data.Log_returns.std() * np.sqrt(252), 3)
+        statistics = self.statistics(self.freq)
+        mean_return = round(statistics['ann_return'], 3)
+        risk = round(statistics['ann_risk'], 3)
         print(f'Return: {mean_return} | Risk: {risk}')
-
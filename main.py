@@ -1,52 +1,78 @@
-from src.Bollinger.Bollinger_trader import BollingerTrader
-from src.SMA.SMA_trader import SMATrader
+import argparse
+import os
+
+# config file of the Oanda account: $OANDA_CONFIG, else src/oanda.cfg next to this file
+DEFAULT_CONFIG = os.environ.get(
+    "OANDA_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "oanda.cfg")
+)
 
 
 class Trading_Strategies:
-    def __init__(self, strategy: str):
+    def __init__(self, strategy: str, config=DEFAULT_CONFIG, instrument="EUR_USD",
+                 bar_length="1min", units=100000, stop=None, journal_file=None,
+                 summary_interval=10, snapshot_file=None, **params):
         self.strategy = strategy
+        self.config = config
+        self.instrument = instrument
+        self.bar_length = bar_length
+        self.units = units
+        self.stop = stop
+        self.journal_file = journal_file
+        self.summary_interval = summary_interval
+        self.snapshot_file = snapshot_file
+        self.params = params
 
-    def bollinger_strategy(self):
-        bollinger_trader = BollingerTrader(
-            "/Users/romain/trading-bot/src/oanda.cfg",
-            "EUR_USD",
-            "1min",
-            SMA=50,
-            dev=2,
-            units=100000,
-        )
-        bollinger_trader.get_most_recent()
-        bollinger_trader.stream_data(bollinger_trader.instrument, stop=100)
-        if bollinger_trader.position != 0:
-            close_order = bollinger_trader.create_order(
-                bollinger_trader.instrument,
-                units=-bollinger_trader.position * bollinger_trader.units,
+    def run_trader(self, trader, stop):
+        trader.get_most_recent()
+        trader.stream_data(trader.instrument, stop=stop)
+        trader.executor.flush()
+        if trader.position != 0:
+            close_order = trader.create_order(
+                trader.instrument,
+                units=-trader.position * trader.units,
                 suppress=True,
                 ret=True,
             )
-            bollinger_trader.report_trade(close_order, "GOING NEUTRAL")
-            bollinger_trader.position = 0
+            trader.report_trade(close_order, "GOING NEUTRAL")
+            trader.position = 0
+        if trader.snapshot is not None:
+            trader.snapshot.save(trader)
+        trader.journal.close()
+        trader.journal.summary()
+
+    def bollinger_strategy(self):
+        # the traders (and tpqoa) are only imported when a strategy is launched
+        from src.Bollinger.Bollinger_trader import BollingerTrader
+
+        bollinger_trader = BollingerTrader(
+            self.config,
+            self.instrument,
+            self.bar_length,
+            SMA=self.params.get("SMA", 50),
+            dev=self.params.get("dev", 2),
+            units=self.units,
+            journal_file=self.journal_file,
+            summary_interval=self.summary_interval,
+            snapshot_file=self.snapshot_file,
+        )
+        self.run_trader(bollinger_trader, self.stop or 100)
 
     def sma_strategy(self):
+        from src.SMA.SMA_trader import SMATrader
+
         sma_trader = SMATrader(
-            "/Users/romain/trading-bot/src/oanda.cfg",
-            "EUR_USD",
-            "1min",
-            SMA_short=50,
-            SMA_long=200,
-            units=100000,
+            self.config,
+            self.instrument,
+            self.bar_length,
+            SMA_short=self.params.get("SMA_short", 50),
+            SMA_long=self.params.get("SMA_long", 200),
+            units=self.units,
+            journal_file=self.journal_file,
+            summary_interval=self.summary_interval,
+            snapshot_file=self.snapshot_file,
         )
-        sma_trader.get_most_recent()
-        sma_trader.stream_data(sma_trader.instrument, stop=30)
-        if sma_trader.position != 0:
-            close_order = sma_trader.create_order(
-                sma_trader.instrument,
-                units=-sma_trader.position * sma_trader.units,
-                suppress=True,
-                ret=True,
-            )
-            sma_trader.report_trade(close_order, "GOING NEUTRAL")
-            sma_trader.position = 0
+        self.run_trader(sma_trader, self.stop or 30)
 
     def launch_trading_strategy(self):
         if self.strategy == "bollinger":
@@ -55,5 +81,48 @@ class Trading_Strategies:
             self.sma_strategy()
 
 
-# test = Trading_Strategies('sma')
-# test.launch_trading_strategy()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Runs a live trading strategy on Oanda.")
+    parser.add_argument("strategy", choices=["sma", "bollinger"])
+    parser.add_argument("--config", default=DEFAULT_CONFIG,
+                        help="tpqoa config file (default: $OANDA_CONFIG or src/oanda.cfg)")
+    parser.add_argument("--instrument", default="EUR_USD")
+    parser.add_argument("--bar-length", default="1min")
+    parser.add_argument("--units", type=int, default=100000)
+    parser.add_argument("--stop", type=int, default=None,
+                        help="number of ticks to stream (default: 30 for sma, 100 for bollinger)")
+    parser.add_argument("--journal", default=None, help="csv file the trades are appended to")
+    parser.add_argument("--summary-interval", type=float, default=10,
+                        help="seconds between console summaries")
+    parser.add_argument("--snapshot", default=None,
+                        help="state file for warm restarts (restored at startup, saved every minute)")
+    parser.add_argument("--sma-short", type=int, default=50)
+    parser.add_argument("--sma-long", type=int, default=200)
+    parser.add_argument("--sma", type=int, default=50)
+    parser.add_argument("--dev", type=float, default=2)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.config):
+        raise SystemExit(f"Config file not found: {args.config} (see src/oanda.cfg.example)")
+    Trading_Strategies(
+        args.strategy,
+        config=args.config,
+        instrument=args.instrument,
+        bar_length=args.bar_length,
+        units=args.units,
+        stop=args.stop,
+        journal_file=args.journal,
+        summary_interval=args.summary_interval,
+        snapshot_file=args.snapshot,
+        SMA_short=args.sma_short,
+        SMA_long=args.sma_long,
+        SMA=args.sma,
+        dev=args.dev,
+    ).launch_trading_strategy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+''' Benchmarks of the vectorized backtesters as data size and grid size grow.
+
+Usage (from the repository root):
+    python -m src.Benchmarks.Backtest_Benchmarks --sizes 10000 100000 1000000 10000000
+    python -m src.Benchmarks.Backtest_Benchmarks --compare bench_results/old.json bench_results/new.json
+'''
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from src.Data.Columnar_Cache import read_columns
+from src.SMA.SMA_Strategy import SMAStrategy
+from src.Bollinger.Bollinger_Strategy import Bollinger
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "csv_files_example")
+
+GRIDS = { # (SMA_short or SMA range, SMA_long or gap range)
+    "sma": {
+        "small": ((10, 20, 1), (100, 110, 1)),
+        "medium": ((10, 50, 1), (100, 252, 1)),
+        "large": ((5, 105, 1), (100, 400, 1)),
+    },
+    "bollinger": {
+        "small": ((10, 20, 1), (1, 4, 1)),
+        "medium": ((10, 100, 1), (1, 5, 0.25)),
+        "large": ((5, 200, 1), (0.5, 5, 0.1)),
+    },
+}
+
+
+def synthetic_prices(bars, seed=0):
+    ''' Geometric Brownian motion of one-minute bars, starting at 1.1 (EURUSD-like).
+    '''
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0, 0.0002, bars)
+    log_returns[0] = 0
+    index = pd.date_range("2000-01-03", periods=bars, freq="min", tz="UTC", name="time")
+    return pd.Series(1.1 * np.exp(np.cumsum(log_returns)), index=index)
+
+
+def fixture_prices(name):
+    ''' Bundled csv files as realistic fixtures.
+    '''
+    filename, column = {
+        "eurusd": ("eurusd.csv", "price"),
+        "five_minute": ("five_minute.csv", "price"),
+        "intraday": ("intraday_pairs.csv", "EURUSD"),
+    }[name]
+    return read_columns(os.path.join(FIXTURES, filename), [column])[column].dropna()
+
+
+def with_returns(prices):
+    data = prices.to_frame("price")
+    data["returns"] = np.log(data.price / data.price.shift(1))
+    return data
+
+
+class SyntheticSMA(SMAStrategy):
+    ''' SMAStrategy on given prices instead of eurusd.csv.
+    '''
+
+    def __init__(self, prices, SMA_short=50, SMA_long=200):
+        self.prices = prices
+        super().__init__("price", None, None, SMA_short, SMA_long)
+
+    def get_data(self):
+        self.data = with_returns(self.prices)
+
+
+class SyntheticBollinger(Bollinger):
+    ''' Bollinger on given prices instead of intraday_pairs.csv.
+    '''
+
+    def __init__(self, prices, SMA=30, gap=2, trading_cost=0.00007):
+        self.prices = prices
+        super().__init__(None, "price", SMA, gap, None, None, trading_cost)
+
+    def get_data(self):
+        self.data = with_returns(self.prices)
+
+
+def synthetic_ml(prices):
+    ''' ML_Strategy on given prices (imported lazily, it needs scikit-learn).
+    '''
+    from src.MachineLearning.ML_Class import ML_Strategy
+
+    class SyntheticML(ML_Strategy):
+
+        def __init__(self, prices):
+            self.prices = prices
+            super().__init__("price", None, None, 0.00007)
+
+        def get_data(self):
+            self.data = with_returns(self.prices)
+
+    return SyntheticML(prices)
+
+
+def cases(prices, grids, ml_max_bars):
+    ''' Yields (name, grid, callable) for every benchmark on a price series.
+    '''
+    yield "sma.test_strategy", None, SyntheticSMA(prices).test_strategy
+    yield "bollinger.test_strategy", None, SyntheticBollinger(prices).test_strategy
+    yield "sma.evaluate", None, SyntheticSMA(prices).evaluate
+    yield "bollinger.evaluate", None, SyntheticBollinger(prices).evaluate
+    if len(prices) <= ml_max_bars:
+        try:
+            ml = synthetic_ml(prices)
+        except ImportError as e:
+            print(f"skipping ml.test_strategy: {e}")
+        else:
+            yield "ml.test_strategy", None, ml.test_strategy
+            yield "ml.evaluate", None, ml.evaluate
+    for grid in grids:
+        sma = SyntheticSMA(prices)
+        yield "sma.optimize_parameters", grid, lambda sma=sma, grid=grid: sma.optimize_parameters(*GRIDS["sma"][grid])
+        bollinger = SyntheticBollinger(prices)
+        yield "bollinger.optimize_parameters", grid, lambda bollinger=bollinger, grid=grid: bollinger.optimize_parameters(*GRIDS["bollinger"][grid])
+
+
+def measure(function, repeat):
+    ''' Returns the best wall time of "repeat" runs, then the peak traced memory and the number
+        of memory blocks still allocated after one traced run.
+    '''
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    function()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {"wall_s": min(timings), "peak_mb": peak / 2 ** 20, "retained_blocks": retained}
+
+
+def run(sizes, fixtures, grids, repeat, ml_max_bars):
+    datasets = [(f"synthetic_{bars}", synthetic_prices(bars)) for bars in sizes]
+    datasets += [(f"fixture_{name}", fixture_prices(name)) for name in fixtures]
+    results = []
+    for dataset, prices in datasets:
+        for name, grid, function in cases(prices, grids, ml_max_bars):
+            result = {"case": name, "data": dataset, "bars": len(prices), "grid": grid}
+            result.update(measure(function, repeat))
+            print("{:<32} {:<26} {:<7} {:>10.4f} s {:>10.1f} MB".format(
+                name, dataset, grid or "-", result["wall_s"], result["peak_mb"]
+            ))
+            results.append(result)
+    return results
+
+
+def version_label():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path, new_path):
+    ''' Prints the wall time and peak memory ratios (new / old) of two result files.
+    '''
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    key = lambda r: (r["case"], r["data"], r["grid"])
+    old_results = {key(r): r for r in old["results"]}
+    print(f"{old['label']} -> {new['label']}")
+    print("{:<32} {:<26} {:<7} {:>10} {:>10}".format("case", "data", "grid", "time", "memory"))
+    for r in new["results"]:
+        o = old_results.get(key(r))
+        if o is None:
+            continue
+        print("{:<32} {:<26} {:<7} {:>9.2f}x {:>9.2f}x".format(
+            r["case"], r["data"], r["grid"] or "-",
+            r["wall_s"] / o["wall_s"] if o["wall_s"] else np.nan,
+            r["peak_mb"] / o["peak_mb"] if o["peak_mb"] else np.nan
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--fixtures", nargs="*", default=["eurusd", "five_minute", "intraday"])
+    parser.add_argument("--grids", nargs="*", default=["small", "medium"], choices=list(GRIDS["sma"]))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ml-max-bars", type=int, default=1_000_000)
+    parser.add_argument("--label", default=None, help="version label (defaults to git describe)")
+    parser.add_argument("--output", default=None, help="results file (defaults to bench_results/<label>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    label = args.label or version_label()
+    results = run(args.sizes, args.fixtures, args.grids, args.repeat, args.ml_max_bars)
+    output = args.output or os.path.join("bench_results", f"{label}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "label": label,
+            "created": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "results": results,
+        }, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,118 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from itertools import product
-plt.style.use("seaborn")
+from src.Data.Columnar_Cache import read_columns
+from src.Optimization.Adaptive_Search import adaptive_search
+from src.Plotting.Plot_Style import pyplot
+
+
+def parameter_values(value_range):
+    ''' Expands a (start, end, step size) tuple into its values, allowing float steps (e.g. for gap).
+    '''
+    if all(isinstance(value, (int, np.integer)) for value in value_range):
+        return list(range(*value_range))
+    return [float(value) for value in np.arange(*value_range)]
+
+
+def band_positions(price, mean, std, gaps):
+    ''' Positions of the Bollinger Bands strategy for several "gaps" at once.
+
+    Returns a (len(gaps), len(price)) array: long below the lower band, short above the upper
+    band, neutral when the price crosses the SMA, otherwise unchanged (neutral at the start).
+    '''
+    distance = price - mean
+    crossed = np.zeros(len(price), dtype = bool)
+    crossed[1:] = distance[1:] * distance[:-1] < 0
+    gap = np.asarray(gaps, dtype = float)[:, None]
+    position = np.where(price < mean - std * gap, 1.0, np.nan)
+    position = np.where(price > mean + std * gap, -1.0, position)
+    position = np.where(crossed, 0.0, position)
+    # forward fill the positions along the time axis, then start neutral
+    last = np.maximum.accumulate(np.where(np.isnan(position), 0, np.arange(len(price))), axis = 1)
+    position = np.take_along_axis(position, last, axis = 1)
+    return np.nan_to_num(position, nan = 0.0)
+
+
+def gap_performance(price, SMA, gaps, trading_cost, block_size = 2 ** 22):
+    ''' Scores all "gaps" for one SMA window in a single pass.
+
+    The rolling mean and standard deviation are computed once and every gap is evaluated as a
+    vectorized band comparison. Returns the absolute strategy performance per gap, equal to what
+    test_strategy() returns (NaN if no data is left).
+    '''
+    price = pd.Series(np.asarray(price, dtype = float))
+    mean = price.rolling(SMA).mean().values
+    std = price.rolling(SMA).std().values
+    price = price.values
+    returns = np.full(len(price), np.nan)
+    returns[1:] = np.log(price[1:] / price[:-1])
+
+    # rows surviving dropna() in test_strategy()
+    valid = ~(np.isnan(mean) | np.isnan(std) | np.isnan(returns))
+    price, mean, std, returns = price[valid], mean[valid], std[valid], returns[valid]
+    gaps = np.asarray(gaps, dtype = float)
+    if len(price) < 2:
+        return np.full(len(gaps), np.nan)
+
+    log_perf = np.empty(len(gaps))
+    chunk = max(1, block_size // len(price))
+    for j in range(0, len(gaps), chunk):
+        position = band_positions(price, mean, std, gaps[j:j + chunk])
+        strategy = position[:, :-1] @ returns[1:]
+        trades = np.abs(np.diff(position[:, 1:], axis = 1)).sum(axis = 1)
+        log_perf[j:j + chunk] = strategy - trades * trading_cost
+    return np.exp(log_perf)
+
+
+def bollinger_metrics(price, returns, SMA, Lower, Upper, trading_cost):
+    ''' Backtests the Bollinger Bands strategy on raw arrays exactly like test_strategy(),
+        without building the results frame.
+
+    Returns the absolute performance, the outperformance and the number of trades.
+    '''
+    valid = ~(np.isnan(price) | np.isnan(returns) | np.isnan(SMA) | np.isnan(Lower) | np.isnan(Upper))
+    first = valid.argmax() # NaNs only precede the first complete row
+    if not valid[first] or len(price) - first < 2:
+        return np.nan, np.nan, 0
+    price, returns, SMA = price[first:], returns[first:], SMA[first:]
+
+    distance = price - SMA
+    position = np.where(price < Lower[first:], 1.0, np.nan)
+    position = np.where(price > Upper[first:], -1.0, position)
+    position[1:] = np.where(distance[1:] * distance[:-1] < 0, 0.0, position[1:])
+    # forward fill the positions, then start neutral
+    last = np.maximum.accumulate(np.where(np.isnan(position), 0, np.arange(len(position))))
+    position = np.nan_to_num(position[last], nan = 0.0)
+
+    trades = np.abs(np.diff(position[1:])).sum()
+    performance = np.exp(position[:-1] @ returns[1:] - trades * trading_cost)
+    outperformance = performance - np.exp(returns[1:].sum())
+    return round(performance, 6), round(outperformance, 6), trades
+
+
+def bollinger_objective(price, trading_cost):
+    ''' Returns objective(combination, fraction) for the adaptive searches, which backtests a
+        (SMA, gap) pair on the first "fraction" of "price". The rolling mean and standard
+        deviation are computed once per SMA window and shared by all gaps.
+    '''
+    price = pd.Series(np.asarray(price, dtype = float))
+    rolling = {}
+    returns = np.full(len(price), np.nan)
+    returns[1:] = np.log(price.values[1:] / price.values[:-1])
+
+    def objective(combination, fraction = 1.0):
+        SMA, gap = combination
+        if SMA not in rolling:
+            rolling[SMA] = price.rolling(SMA).mean().values, price.rolling(SMA).std().values
+        mean, std = rolling[SMA]
+        end = int(round(len(price) * fraction))
+        mean, std = mean[:end], std[:end]
+        return bollinger_metrics(
+            price.values[:end], returns[:end], mean, mean - std * gap, mean + std * gap, trading_cost
+        )[0]
+
+    return objective
+
 
 class Bollinger():
     ''' Class for the vectorized backtesting of Bollinger Bands-based trading strategies.
@@ -33,6 +143,7 @@ class Bollinger():
         self.end = end
         self.trading_cost = trading_cost
         self.results = None
+        self.evaluated = False # results frame still to build for plot_results()
         self.get_data()
         self.prepare_data()
         
@@ -42,9 +153,7 @@ class Bollinger():
     def get_data(self):
         ''' Imports the data from specified source 
         '''
-        raw_data = pd.read_csv("intraday_pairs.csv", parse_dates = ["time"], index_col = "time")
-        raw_data = raw_data[self.ticker].to_frame().dropna()
-        raw_data = raw_data.loc[self.start:self.end]
+        raw_data = read_columns("intraday_pairs.csv", [self.ticker], self.start, self.end).dropna()
         raw_data.rename(columns={self.ticker: "price"}, inplace=True)
         raw_data["returns"] = np.log(raw_data / raw_data.shift(1))
         self.data = raw_data
@@ -64,13 +173,14 @@ class Bollinger():
         if SMA is not None:
             self.SMA = SMA
             self.data["SMA"] = self.data["price"].rolling(self.SMA).mean()
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.gap
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.gap
             
         if gap is not None:
             self.gap = gap
-            self.data["Lower"] = self.data["SMA"] - self.data["price"].rolling(self.SMA).std() * self.gap
-            self.data["Upper"] = self.data["SMA"] + self.data["price"].rolling(self.SMA).std() * self.gap
+            
+        if SMA is not None or gap is not None:
+            std = self.data["price"].rolling(self.SMA).std()
+            self.data["Lower"] = self.data["SMA"] - std * self.gap
+            self.data["Upper"] = self.data["SMA"] + std * self.gap
             
     def test_strategy(self):
         ''' Backtests the Bollinger Bands-based trading strategy.
@@ -93,37 +203,75 @@ class Bollinger():
         data["creturns"] = data["returns"].cumsum().apply(np.exp)
         data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
         self.results = data
+        self.evaluated = False
        
         perf = data["cstrategy"].iloc[-1] # absolute performance of the strategy
         outperf = perf - data["creturns"].iloc[-1] # out-/underperformance of strategy
         
         return round(perf, 6), round(outperf, 6)
     
+    def evaluate(self):
+        ''' Backtests the Bollinger Bands-based trading strategy on the raw arrays (no results frame).
+
+        Returns the absolute performance, the outperformance and the number of trades.
+        '''
+        metrics = bollinger_metrics(
+            *(self.data[column].to_numpy() for column in ["price", "returns", "SMA", "Lower", "Upper"]),
+            self.trading_cost
+        )
+        self.results = None
+        self.evaluated = True
+        return metrics
+
     def plot_results(self):
         ''' Plots the performance of the trading strategy and compares to "buy and hold".
         '''
+        if self.results is None and self.evaluated:
+            self.test_strategy() # builds the results frame of the last evaluate()
         if self.results is None:
             print("Run test_strategy() first.")
         else:
+            pyplot()
             title = "{} | SMA = {} | gap = {} | trading_cost = {}".format(self.ticker, self.SMA, self.gap, self.trading_cost)
             self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))     
    
-    def optimize_parameters(self, SMA_range, gap_range):
+    def optimize_parameters(self, SMA_range, gap_range, search = "grid", budget = None, seed = None):
         ''' Finds the optimal strategy (global maximum) given the Bollinger Bands parameter ranges.
 
         Parameters
         ----------
         SMA_range, gap_range: tuple
-            tuples of the form (start, end, step size)
+            tuples of the form (start, end, step size), gap_range may use float values
+        search: str
+            "grid" (every combination), "random", "halving" (successive halving on growing
+            data prefixes) or "tpe" (tree-structured Parzen estimator)
+        budget: int
+            number of full backtests of the adaptive searches (defaults to 10% of the grid)
+        seed: int
+            seed of the adaptive searches
         '''
         
-        combinations = list(product(range(*SMA_range), range(*gap_range)))
+        SMA_values = range(*SMA_range)
+        gap_values = parameter_values(gap_range)
         
-        # test all combinations
-        results = []
-        for comb in combinations:
-            self.set_parameters(comb[0], comb[1])
-            results.append(self.test_strategy()[0])
+        if search == "grid":
+            combinations = list(product(SMA_values, gap_values))
+            # test all gaps of a SMA window at once
+            results = []
+            for SMA in SMA_values:
+                perf = gap_performance(self.data["price"].values, SMA, gap_values, self.trading_cost)
+                results.extend(np.round(perf, 6))
+        else:
+            if budget is None:
+                budget = max(1, len(SMA_values) * len(gap_values) // 10)
+            combinations, perf = adaptive_search(
+                search,
+                [SMA_values, gap_values],
+                bollinger_objective(self.data["price"].values, self.trading_cost),
+                budget,
+                seed
+            )
+            results = list(np.round(perf, 6))
         
         best_perf = np.max(results) # best performance
         opt = combinations[np.argmax(results)] # optimal parameters
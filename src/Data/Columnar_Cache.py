@@ -0,0 +1,138 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TRADING_BOT_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "trading-bot")
+)
+
+
+class ColumnarCache():
+    ''' Columnar binary cache of csv price files.
+
+    Each csv (first column = dates) is converted once into one .npy file per column plus a
+    sorted int64 index. Entries are keyed on the source path and its modification time and
+    never change once written, so concurrent processes can convert and read the same file. Columns are memory-mapped on demand and sliced by date through
+    a binary search on the index, so only the requested ticker and period are read.
+    '''
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "columnar")
+        self._meta = {}
+
+    def __repr__(self):
+        return f"ColumnarCache(cache_dir = {self.cache_dir})"
+
+    def entry(self, filename):
+        ''' Returns the cache directory and metadata of a csv file, converting it if needed.
+        '''
+        source = os.path.abspath(filename)
+        mtime = os.stat(source).st_mtime_ns
+        key = hashlib.sha1(source.encode()).hexdigest()[:16]
+        directory = os.path.join(self.cache_dir, f"{key}-{mtime}")
+        meta = self._meta.get(directory)
+        if meta is None:
+            meta = self._read_meta(directory)
+            if meta is None:
+                meta = self.convert(source, directory, mtime)
+                self._remove_stale(key, directory)
+            self._meta[directory] = meta
+        return directory, meta
+
+    def _read_meta(self, directory):
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def convert(self, source, directory, mtime):
+        ''' Parses a csv file once and writes its index and columns as .npy files.
+        '''
+        raw = pd.read_csv(source, index_col=0, parse_dates=[0]).sort_index()
+        index = pd.DatetimeIndex(raw.index)
+        tz = None if index.tz is None else str(index.tz)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # each conversion writes to its own directory, which is renamed into place when complete
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            np.save(os.path.join(tmp, "index.npy"), index.as_unit("ns").asi8)
+            for i, column in enumerate(raw.columns):
+                np.save(os.path.join(tmp, f"column_{i}.npy"), raw[column].to_numpy(dtype=np.float64))
+            meta = {
+                "source": source,
+                "mtime": mtime,
+                "index_name": raw.index.name,
+                "tz": tz,
+                "columns": list(raw.columns),
+            }
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            os.rename(tmp, directory)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # another process converted the same version of the file first
+            converted = self._read_meta(directory)
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST) or converted is None:
+                raise
+            return converted
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return meta
+
+    def _remove_stale(self, key, directory):
+        ''' Removes the entries of older versions of a source file.
+        '''
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if (name == key or name.startswith(f"{key}-")) and path != directory:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def index(self, filename):
+        ''' Returns the DatetimeIndex of a csv file.
+        '''
+        directory, meta = self.entry(filename)
+        values = np.load(os.path.join(directory, "index.npy"), mmap_mode="r")
+        index = pd.DatetimeIndex(np.asarray(values).view("datetime64[ns]"), name=meta["index_name"])
+        if meta["tz"] is not None:
+            index = index.tz_localize("UTC").tz_convert(meta["tz"])
+        return index
+
+    def column(self, filename, column):
+        ''' Returns a memory-mapped column of a csv file.
+        '''
+        directory, meta = self.entry(filename)
+        if column not in meta["columns"]:
+            raise KeyError(f"{column!r} not in {filename} (columns: {meta['columns']})")
+        position = meta["columns"].index(column)
+        return np.load(os.path.join(directory, f"column_{position}.npy"), mmap_mode="r")
+
+    def load(self, filename, columns=None, start=None, end=None):
+        ''' Returns the selected columns of a csv file between "start" and "end" (inclusive,
+            like .loc[start:end]) as a DataFrame.
+        '''
+        _, meta = self.entry(filename)
+        columns = meta["columns"] if columns is None else list(columns)
+        index = self.index(filename)
+        rows = index.slice_indexer(start, end)
+        return pd.DataFrame(
+            {column: self.column(filename, column)[rows] for column in columns},
+            index=index[rows]
+        )
+
+
+cache = ColumnarCache()
+
+
+def read_columns(filename, columns=None, start=None, end=None):
+    ''' Reads columns of a csv price file through the default columnar cache.
+    '''
+    return cache.load(filename, columns, start, end)
@@ -0,0 +1,137 @@
+import os
+import tempfile
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+from src.Data.Columnar_Cache import DEFAULT_CACHE_DIR
+
+
+def yahoo_download(tickers, start, end):
+    ''' Downloads daily closes of several tickers from Yahoo Finance in a single request.
+
+    Returns a DataFrame with one column per ticker ("end" is exclusive, as in yf.download).
+    '''
+    import yfinance as yf
+
+    close = yf.download(list(tickers), start, end, progress=False).Close
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+    return close
+
+
+class PriceCache():
+    ''' On-disk cache of daily close prices per ticker.
+
+    Each ticker is stored with the date range it covers, so a request only downloads the dates
+    missing before or after that range. Tickers missing the same range are fetched together in
+    one downloader call. The downloader is any callable with yahoo_download's signature, which
+    lets tests and offline runs use a local stand-in.
+    '''
+
+    def __init__(self, cache_dir=None, downloader=None):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "prices")
+        self.downloader = downloader or yahoo_download
+
+    def __repr__(self):
+        return f"PriceCache(cache_dir = {self.cache_dir})"
+
+    def path(self, ticker):
+        return os.path.join(self.cache_dir, f"{quote(ticker, safe='')}.npz")
+
+    def read(self, ticker):
+        ''' Returns the cached closes of a ticker and the covered [start, end) range (None if not cached).
+        '''
+        try:
+            with np.load(self.path(ticker)) as cached:
+                closes = pd.Series(
+                    cached["closes"],
+                    index=pd.DatetimeIndex(cached["dates"].view("datetime64[ns]")),
+                    name=ticker
+                )
+                covered = pd.Timestamp(int(cached["start"])), pd.Timestamp(int(cached["end"]))
+        except (OSError, KeyError, ValueError):
+            return None, None
+        return closes, covered
+
+    def write(self, ticker, closes, covered):
+        ''' Writes the closes of a ticker and their covered range to the cache (atomically).
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(ticker)
+        # a unique temp file per call: the same ticker may be written from several threads
+        fd, tmp = tempfile.mkstemp(suffix=".npz", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    dates=closes.index.as_unit("ns").asi8,
+                    closes=closes.to_numpy(dtype=np.float64),
+                    start=covered[0].value,
+                    end=covered[1].value
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def missing(self, covered, start, end):
+        ''' Returns the [start, end) ranges to download so that the covered range includes [start, end).
+        '''
+        if covered is None:
+            return [(start, end)] if start < end else []
+        ranges = []
+        if start < covered[0]:
+            ranges.append((start, covered[0]))
+        if end > covered[1]:
+            ranges.append((covered[1], end)) # from the covered end, so the cached range stays contiguous
+        return ranges
+
+    def load(self, tickers, start, end):
+        ''' Returns the daily closes of "tickers" between "start" (inclusive) and "end" (exclusive)
+            as a DataFrame with one column per ticker, downloading only the missing dates.
+        '''
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        start = pd.Timestamp(start).normalize()
+        # today's close is not final yet, so the covered range never goes beyond today
+        today = pd.Timestamp.today().normalize()
+        end = pd.Timestamp(end).normalize() if end is not None else today + pd.Timedelta(days=1)
+
+        cached, requests = {}, {}
+        for ticker in tickers:
+            closes, covered = self.read(ticker)
+            cached[ticker] = closes, covered
+            for span in self.missing(covered, start, end):
+                requests.setdefault(span, []).append(ticker)
+
+        # one downloader call per distinct missing range, shared by all tickers that need it
+        fetched = {ticker: [] for ticker in tickers}
+        for span, group in requests.items():
+            downloaded = self.downloader(group, *span)
+            for ticker in group:
+                # a failed ticker comes back as an all-NaN column (or not at all)
+                closes = downloaded[ticker].dropna() if ticker in downloaded else ()
+                if len(closes):
+                    fetched[ticker].append((span, closes))
+
+        prices = {}
+        for ticker in tickers:
+            closes, covered = cached[ticker]
+            if fetched[ticker]:
+                # only the ranges that returned data are added to the covered range
+                parts = ([] if closes is None else [closes]) + [part for _, part in fetched[ticker]]
+                closes = pd.concat(parts)
+                closes.index = pd.DatetimeIndex(closes.index).tz_localize(None).as_unit("ns")
+                closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+                spans = [span for span, _ in fetched[ticker]] + ([covered] if covered is not None else [])
+                covered = (
+                    min(first for first, _ in spans),
+                    min(max(last for _, last in spans), today)
+                )
+                self.write(ticker, closes.rename(ticker), covered)
+            elif closes is None:
+                closes = pd.Series(dtype=np.float64, index=pd.DatetimeIndex([], dtype="datetime64[ns]"))
+            prices[ticker] = closes.loc[start:end - pd.Timedelta(1)]
+        return pd.DataFrame(prices).rename_axis("Date")
+
+
+prices_cache = PriceCache()
@@ -0,0 +1,142 @@
+import asyncio
+from src.Live.Bar_Builder import BarAggregator
+
+
+class TradingEngine():
+    ''' Runs several live traders (SMATrader, BollingerTrader, ...) in one process.
+
+    All instruments share a single price stream. Ticks are handed from the streaming thread to
+    an asyncio event loop and dispatched to every trader subscribed to the tick's instrument.
+    Traders and other consumers can instead subscribe to closed OHLC bars, which a shared
+    BarAggregator builds once per tick for all bar lengths. History downloads of all traders
+    run concurrently at startup.
+    '''
+
+    def __init__(self, api=None, fill_empty_bars=False):
+        '''
+        Parameters
+        ----------
+        api: tpqoa.tpqoa
+            connection used for the price stream (defaults to the first trader added)
+        fill_empty_bars: bool
+            emit bars without ticks (flat at the previous close) to subscribe_bars() callbacks;
+            traders added with bars=True always get them, as their tick path forward fills
+        '''
+        self.api = api
+        self.subscribers = {}
+        self.bar_traders = []
+        self.bars = BarAggregator(fill_empty_bars)
+        self.bar_instruments = set()
+        self.ticks = 0
+        # tick counts per trader; trader.ticks is the stop counter of tpqoa's stream_data
+        self.trader_ticks = {}
+
+    def __repr__(self):
+        return f"TradingEngine(instruments = {self.instruments}, traders = {len(self.traders)})"
+
+    @property
+    def traders(self):
+        return [trader for traders in self.subscribers.values() for trader in traders] + self.bar_traders
+
+    @property
+    def instruments(self):
+        return list(dict.fromkeys([*self.subscribers, *self.bar_instruments]))
+
+    def add_trader(self, trader, bars=False):
+        ''' Subscribes a trader to the ticks of its instrument (on_success), or with bars=True to
+            the closed bars of its bar_length built by the shared aggregator (on_bar).
+        '''
+        if bars:
+            # forward filled like TickBuffer.bars, so on_bar builds the same history as on_success
+            self.subscribe_bars(trader.bar_length, trader.on_bar, trader.instrument, fill_empty=True)
+            self.bar_traders.append(trader)
+        else:
+            self.subscribers.setdefault(trader.instrument, []).append(trader)
+        if self.api is None:
+            self.api = trader
+
+    def subscribe_bars(self, bar_length, callback, instrument, fill_empty=None):
+        ''' Calls callback(instrument, bar) with every closed OHLC bar of "instrument".
+        '''
+        self.bars.subscribe(bar_length, callback, instrument, fill_empty)
+        self.bar_instruments.add(instrument)
+
+    async def prepare(self):
+        ''' Loads the recent history of all traders concurrently.
+        '''
+        loop = asyncio.get_running_loop()
+        self.trader_ticks = {trader: 0 for trader in self.traders}
+        # the broker only knows the combined position of traders sharing an instrument
+        instruments = [trader.instrument for trader in self.traders]
+        for trader in self.traders:
+            if trader.snapshot is not None and instruments.count(trader.instrument) > 1:
+                trader.snapshot.reconcile = False
+        await asyncio.gather(*(
+            loop.run_in_executor(None, trader.get_most_recent)
+            for trader in self.traders
+        ))
+
+    def stream(self, loop, queue, stop):
+        ''' Streams the prices of all instruments (blocking, runs in a worker thread).
+        '''
+        def on_tick(instrument, time, bid, ask):
+            loop.call_soon_threadsafe(queue.put_nowait, (instrument, time, bid, ask))
+
+        try:
+            self.api.stream_data(
+                ",".join(self.instruments),
+                stop=stop,
+                callback=on_tick
+            )
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    async def dispatch(self, queue):
+        ''' Hands every tick to the traders subscribed to its instrument.
+        '''
+        while True:
+            tick = await queue.get()
+            if tick is None:
+                break
+            instrument, time, bid, ask = tick
+            self.ticks += 1
+            self.bars.on_tick(instrument, time, bid, ask)
+            for trader in self.subscribers.get(instrument, ()):
+                self.trader_ticks[trader] = self.trader_ticks.get(trader, 0) + 1
+                trader.on_success(time, bid, ask)
+
+    async def run(self, stop=None):
+        ''' Prepares all traders, then trades until "stop" ticks were streamed or stop() is called.
+        '''
+        loop = asyncio.get_running_loop()
+        await self.prepare()
+        queue = asyncio.Queue()
+        streaming = loop.run_in_executor(None, self.stream, loop, queue, stop)
+        await self.dispatch(queue)
+        await streaming
+
+    def start(self, stop=None):
+        ''' Runs the engine on a new event loop (blocking).
+        '''
+        asyncio.run(self.run(stop))
+
+    def stop(self):
+        ''' Ends the price stream after the next message.
+        '''
+        self.api.stop_stream = True
+
+    def close_positions(self):
+        ''' Goes neutral with every trader holding a position.
+        '''
+        for trader in self.traders:
+            trader.executor.flush()
+            if trader.position != 0:
+                close_order = trader.create_order(
+                    trader.instrument,
+                    units=-trader.position * trader.units,
+                    suppress=True,
+                    ret=True,
+                )
+                trader.report_trade(close_order, "GOING NEUTRAL")
+                trader.position = 0
+            trader.journal.close()
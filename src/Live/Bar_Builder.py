@@ -0,0 +1,112 @@
+from collections import namedtuple
+import pandas as pd
+
+Bar = namedtuple(
+    "Bar",
+    ["time", "open", "high", "low", "close", "ticks", "spread_mean", "spread_max"]
+)
+Bar.__doc__ = ''' Closed OHLC bar of mid prices, labelled with its right edge (UTC) like
+    resample(bar_length, label="right").
+'''
+
+
+class _BarState():
+    ''' Running values of the bar being built for one instrument and bar length.
+    '''
+    __slots__ = ("bucket", "open", "high", "low", "close", "ticks", "spread_sum", "spread_max")
+
+    def __init__(self, bucket, price, spread):
+        self.bucket = bucket
+        self.open = self.high = self.low = self.close = price
+        self.ticks = 1
+        self.spread_sum = self.spread_max = spread
+
+
+class BarAggregator():
+    ''' Builds OHLC bars for several bar lengths from a single pass over the ticks.
+
+    Each tick updates the open bar of every subscribed bar length of its instrument; a bar is
+    closed and handed to its subscribers by the first tick of a later bar. Bars without ticks
+    are skipped, like resample().last().dropna(), unless "fill_empty" is set (for the aggregator
+    or per subscription), in which case they are emitted flat at the previous close with a tick
+    count of 0, like resample().last().ffill().
+    '''
+
+    def __init__(self, fill_empty=False):
+        self.fill_empty = fill_empty
+        self.subscribers = {}  # bar length (ns) -> [(instrument or None, callback, fill_empty)]
+        self.states = {}  # (instrument, bar length (ns)) -> _BarState
+
+    def __repr__(self):
+        lengths = [str(pd.Timedelta(length)) for length in self.subscribers]
+        return f"BarAggregator(bar_lengths = {lengths}, fill_empty = {self.fill_empty})"
+
+    def subscribe(self, bar_length, callback, instrument=None, fill_empty=None):
+        ''' Calls callback(instrument, bar) with every closed bar of length "bar_length" (e.g.
+            "1min") of "instrument" (of all instruments if None). "fill_empty" overrides the
+            aggregator's setting for this subscription.
+        '''
+        length = pd.to_timedelta(bar_length).value
+        if fill_empty is None:
+            fill_empty = self.fill_empty
+        self.subscribers.setdefault(length, []).append((instrument, callback, fill_empty))
+
+    def on_tick(self, instrument, time, bid, ask):
+        ''' Adds a tick (time as ns since epoch or ISO string) to the bars of all bar lengths.
+        '''
+        if not isinstance(time, int):
+            time = pd.Timestamp(time).value
+        price = (ask + bid) / 2
+        spread = ask - bid
+        for length in self.subscribers:
+            bucket = time // length
+            state = self.states.get((instrument, length))
+            if state is None:
+                self.states[instrument, length] = _BarState(bucket, price, spread)
+            elif bucket == state.bucket:
+                state.high = max(state.high, price)
+                state.low = min(state.low, price)
+                state.close = price
+                state.ticks += 1
+                state.spread_sum += spread
+                state.spread_max = max(state.spread_max, spread)
+            elif bucket > state.bucket:
+                self.close(instrument, length, state, bucket)
+                self.states[instrument, length] = _BarState(bucket, price, spread)
+            # ticks older than the open bar are ignored
+
+    def close(self, instrument, length, state, next_bucket=None):
+        ''' Emits the bar of "state" (and the empty bars up to "next_bucket" if fill_empty).
+        '''
+        self.emit(instrument, length, Bar(
+            pd.Timestamp((state.bucket + 1) * length, tz="UTC"),
+            state.open,
+            state.high,
+            state.low,
+            state.close,
+            state.ticks,
+            state.spread_sum / state.ticks,
+            state.spread_max
+        ))
+        if next_bucket is not None:
+            for bucket in range(state.bucket + 1, next_bucket):
+                self.emit(instrument, length, Bar(
+                    pd.Timestamp((bucket + 1) * length, tz="UTC"),
+                    state.close, state.close, state.close, state.close, 0, float("nan"), float("nan")
+                ), empty=True)
+
+    def emit(self, instrument, length, bar, empty=False):
+        for subscribed, callback, fill_empty in self.subscribers[length]:
+            if (subscribed is None or subscribed == instrument) and (fill_empty or not empty):
+                callback(instrument, bar)
+
+    def flush(self, time=None):
+        ''' Closes the open bars that ended by "time" (all open bars if None), e.g. when the
+            stream goes quiet or stops.
+        '''
+        if time is not None and not isinstance(time, int):
+            time = pd.Timestamp(time).value
+        for (instrument, length), state in list(self.states.items()):
+            if time is None or (state.bucket + 1) * length <= time:
+                self.close(instrument, length, state)
+                del self.states[instrument, length]
@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+
+
+class BarHistory():
+    ''' Sliding window over the most recent bars of a live trader.
+
+    Only the last "max_bars" bars are kept in memory, so memory and the cost of appending a bar
+    stay flat over long sessions. Bars leaving the window can optionally be appended to a csv file.
+    '''
+
+    def __init__(self, max_bars, spill_path=None):
+        self.max_bars = max_bars
+        self.spill_path = spill_path
+        self.data = None
+
+    def __repr__(self):
+        bars = 0 if self.data is None else len(self.data)
+        return f"BarHistory(bars = {bars}, max_bars = {self.max_bars}, spill_path = {self.spill_path})"
+
+    def reset(self, bars):
+        ''' Replaces the history (e.g. after a history download), keeping only the last "max_bars".
+        '''
+        self.data = bars.iloc[-self.max_bars:]
+
+    def extend(self, bars):
+        ''' Appends new bars and drops (or spills) the ones falling out of the window.
+        '''
+        data = bars if self.data is None else pd.concat([self.data, bars])
+        if len(data) > self.max_bars:
+            if self.spill_path is not None:
+                self.spill(data.iloc[:-self.max_bars])
+            data = data.iloc[-self.max_bars:]
+        self.data = data
+
+    def spill(self, bars):
+        ''' Appends bars to the spill file.
+        '''
+        bars.to_csv(
+            self.spill_path,
+            mode="a",
+            header=not os.path.exists(self.spill_path)
+        )
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.Data.Columnar_Cache import DEFAULT_CACHE_DIR
+
+
+class CandleCache():
+    ''' On-disk cache of mid close candles per instrument and granularity.
+
+    update() only downloads the candles missing from the cache (usually the last few seconds
+    or minutes), so warm restarts and the alignment loop of get_most_recent avoid full history
+    pulls. Any object with tpqoa's get_history signature can serve as the data source.
+    '''
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "candles")
+
+    def __repr__(self):
+        return f"CandleCache(cache_dir = {self.cache_dir})"
+
+    def path(self, instrument, granularity):
+        return os.path.join(self.cache_dir, f"{instrument}_{granularity}.npz")
+
+    def load(self, instrument, granularity):
+        ''' Returns the cached closes as a Series with a UTC DatetimeIndex (empty if none).
+        '''
+        try:
+            with np.load(self.path(instrument, granularity)) as cached:
+                times, closes = cached["times"], cached["closes"]
+        except (OSError, KeyError, ValueError):
+            times, closes = np.empty(0, dtype=np.int64), np.empty(0)
+        return pd.Series(closes, index=pd.to_datetime(times, utc=True), name="c")
+
+    def save(self, instrument, granularity, closes):
+        ''' Writes the closes to the cache (atomically).
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(instrument, granularity)
+        # a unique temp file per call: traders on the same instrument may save concurrently
+        fd, tmp = tempfile.mkstemp(suffix=".npz", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    times=closes.index.as_unit("ns").asi8,
+                    closes=closes.to_numpy(dtype=np.float64)
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def fetch(self, api, instrument, start, end, granularity, price):
+        ''' Downloads the closes between two UTC timestamps.
+        '''
+        if start >= end:
+            return None
+        df = api.get_history(
+            instrument=instrument,
+            start=start.tz_convert(None).to_pydatetime(),
+            end=end.tz_convert(None).to_pydatetime(),
+            granularity=granularity,
+            price=price,
+            localize=False
+        )
+        if len(df) == 0:
+            return None
+        closes = df.c.dropna()
+        if closes.index.tz is None:
+            closes.index = closes.index.tz_localize("UTC")
+        return closes
+
+    def update(self, api, instrument, start, end, granularity="S5", price="M"):
+        ''' Returns the closes between "start" and "end" (naive UTC datetimes), downloading only
+            the periods missing from the cache, and stores the result.
+        '''
+        start = pd.Timestamp(start, tz="UTC")
+        end = pd.Timestamp(end, tz="UTC")
+        cached = self.load(instrument, granularity).loc[start:]
+        if len(cached) == 0:
+            parts = [self.fetch(api, instrument, start, end, granularity, price)]
+        else:
+            # the last cached candle may have been incomplete, so it is downloaded again
+            parts = [
+                self.fetch(api, instrument, start, cached.index[0], granularity, price),
+                cached,
+                self.fetch(api, instrument, cached.index[-1], end, granularity, price),
+            ]
+        parts = [part for part in parts if part is not None and len(part)]
+        if not parts:
+            return cached
+        closes = pd.concat(parts)
+        closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+        closes = closes.loc[start:end].rename("c")
+        self.save(instrument, granularity, closes)
+        return closes
@@ -0,0 +1,114 @@
+import math
+
+
+class RollingWindow():
+    ''' Fixed-size window of the most recent values with running sums of values and squared values.
+
+    Every update costs O(1): the value leaving the window is subtracted from the sums. Values are
+    stored relative to the first value seen to keep the sums small, and the sums are rebuilt from
+    the window once per full turn so that rounding errors cannot pile up.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.reference = None
+
+    def __repr__(self):
+        return f"RollingWindow(size = {self.size}, count = {self.count})"
+
+    @property
+    def ready(self):
+        return self.count >= self.size
+
+    def update(self, value):
+        ''' Adds a new value and drops the oldest one once the window is full.
+        '''
+        if self.reference is None:
+            self.reference = value
+        value -= self.reference
+        i = self.count % self.size
+        if self.count >= self.size:
+            old = self.values[i]
+            self.sum -= old
+            self.sum_sq -= old * old
+        self.values[i] = value
+        self.sum += value
+        self.sum_sq += value * value
+        self.count += 1
+        if i == self.size - 1:
+            self.sum = math.fsum(self.values)
+            self.sum_sq = math.fsum(v * v for v in self.values)
+
+    def mean(self):
+        ''' Mean of the window (NaN until the window is full), like rolling(size).mean().
+        '''
+        if not self.ready:
+            return math.nan
+        return self.sum / self.size + self.reference
+
+    def std(self):
+        ''' Sample standard deviation of the window (NaN until full), like rolling(size).std().
+        '''
+        if not self.ready or self.size < 2:
+            return math.nan
+        variance = (self.sum_sq - self.sum * self.sum / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class SMACrossover():
+    ''' Incremental state of the SMA crossover strategy: long (1) if SMA_short > SMA_long, else short (-1).
+    '''
+
+    def __init__(self, SMA_short, SMA_long):
+        self.short = RollingWindow(SMA_short)
+        self.long = RollingWindow(SMA_long)
+        self.position = 0
+
+    def __repr__(self):
+        return f"SMACrossover(SMA_short = {self.short.size}, SMA_long = {self.long.size}, position = {self.position})"
+
+    def update(self, price):
+        ''' Adds the close of a new bar and returns the resulting position.
+        '''
+        self.short.update(price)
+        self.long.update(price)
+        # comparisons with NaN are False, as with np.where on the rolling means
+        self.position = 1 if self.short.mean() > self.long.mean() else -1
+        return self.position
+
+
+class BollingerBands():
+    ''' Incremental state of the Bollinger Bands strategy.
+
+    Long (1) below the lower band, short (-1) above the upper band, neutral (0) when the price
+    crosses the SMA, otherwise the previous position is kept.
+    '''
+
+    def __init__(self, SMA, dev):
+        self.window = RollingWindow(SMA)
+        self.dev = dev
+        self.distance = math.nan
+        self.position = 0
+
+    def __repr__(self):
+        return f"BollingerBands(SMA = {self.window.size}, dev = {self.dev}, position = {self.position})"
+
+    def update(self, price):
+        ''' Adds the close of a new bar and returns the resulting position.
+        '''
+        self.window.update(price)
+        SMA = self.window.mean()
+        std = self.window.std()
+        distance = price - SMA
+        if price < SMA - std * self.dev:
+            self.position = 1
+        elif price > SMA + std * self.dev:
+            self.position = -1
+        if distance * self.distance < 0:
+            self.position = 0
+        self.distance = distance
+        return self.position
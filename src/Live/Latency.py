@@ -0,0 +1,134 @@
+import json
+import time
+
+SUB_BUCKETS = 16  # per power of two, i.e. at most 1/16 relative error
+SUB_BITS = 4
+
+
+class LatencyHistogram():
+    ''' Log-linear histogram of durations in ns.
+
+    Durations below 32 ns are counted exactly, larger ones in 16 buckets per power of two.
+    Recording is a couple of integer operations, so it can stay on in production.
+    '''
+
+    def __init__(self):
+        self.counts = [0] * (64 * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def __repr__(self):
+        return f"LatencyHistogram(count = {self.count}, max = {self.max})"
+
+    def record(self, ns):
+        if ns < 2 * SUB_BUCKETS:
+            index = max(ns, 0)
+        else:
+            shift = ns.bit_length() - SUB_BITS - 1
+            index = (shift << SUB_BITS) + (ns >> shift)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        ''' Returns the upper bound (ns) of the bucket holding the q-th percentile.
+        '''
+        if self.count == 0:
+            return 0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                if index < 2 * SUB_BUCKETS:
+                    return index
+                shift = (index >> SUB_BITS) - 1
+                mantissa = index - (shift << SUB_BITS)
+                return min(((mantissa + 1) << shift) - 1, self.max)
+        return self.max
+
+
+class LatencyRecorder():
+    ''' Per-stage latency histograms of the live tick-to-order path.
+
+    The tick thread calls start() when a tick arrives and lap(stage) after every stage, which
+    records the time since the previous lap. summary() returns p50/p99/max per stage, report()
+    prints them (also every "report_interval" seconds through maybe_report()) and dump() writes
+    them with the raw bucket counts as JSON.
+    '''
+
+    def __init__(self, report_interval=None):
+        self.report_interval = report_interval
+        self.histograms = {}
+        self.started = self.last = time.perf_counter_ns()
+        self.next_report = self.started + int((report_interval or 0) * 1e9)
+
+    def __repr__(self):
+        return f"LatencyRecorder(stages = {list(self.histograms)}, report_interval = {self.report_interval})"
+
+    def record(self, stage, ns):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(ns)
+
+    def start(self):
+        self.started = self.last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.record(stage, now - self.last)
+        self.last = now
+
+    def elapsed(self, stage):
+        ''' Records the time since start() (e.g. tick to order submission).
+        '''
+        self.record(stage, time.perf_counter_ns() - self.started)
+
+    def summary(self):
+        ''' Returns count, mean, p50, p99 and max (in microseconds) per stage.
+        '''
+        # stages such as order_round_trip are added from the order thread, so iterate over a copy
+        return {
+            stage: {
+                "count": h.count,
+                "mean_us": h.total / h.count / 1e3 if h.count else 0.0,
+                "p50_us": h.percentile(50) / 1e3,
+                "p99_us": h.percentile(99) / 1e3,
+                "max_us": h.max / 1e3,
+            }
+            for stage, h in list(self.histograms.items())
+        }
+
+    def report(self):
+        print("\n" + 100 * "-")
+        print("{:<20} {:>10} {:>12} {:>12} {:>12}".format("stage", "count", "p50 (us)", "p99 (us)", "max (us)"))
+        for stage, s in self.summary().items():
+            print("{:<20} {:>10} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                stage, s["count"], s["p50_us"], s["p99_us"], s["max_us"]
+            ))
+        print(100 * "-" + "\n")
+
+    def maybe_report(self):
+        ''' Prints the summary if "report_interval" seconds passed since the last report.
+        '''
+        if self.report_interval and self.last >= self.next_report:
+            self.next_report = self.last + int(self.report_interval * 1e9)
+            self.report()
+
+    def dump(self, path):
+        ''' Writes the summary and the raw histograms as JSON.
+        '''
+        data = {
+            "sub_buckets": SUB_BUCKETS,
+            "summary": self.summary(),
+            "buckets": {
+                stage: {str(i): c for i, c in enumerate(h.counts) if c}
+                for stage, h in list(self.histograms.items())
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
@@ -0,0 +1,71 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class OrderExecutor():
+    ''' Sends orders to the broker from a worker thread.
+
+    submit() only enqueues the order and returns a Future, so tick ingestion and bar
+    construction never wait for the broker. The fill callback runs on the worker thread as
+    soon as the broker confirms the order, before the Future is resolved.
+    '''
+
+    def __init__(self, create_order):
+        '''
+        Parameters
+        ----------
+        create_order: callable
+            tpqoa's create_order (or a fake broker's) taking instrument, units, suppress and ret
+        '''
+        self.create_order = create_order
+        self.orders = queue.Queue()
+        self.thread = None
+
+    def __repr__(self):
+        return f"OrderExecutor(pending = {self.orders.unfinished_tasks})"
+
+    def submit(self, instrument, units, on_fill=None):
+        ''' Enqueues a market order and returns a Future of the broker's order confirmation.
+        '''
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+        future = Future()
+        self.orders.put((future, instrument, units, on_fill))
+        return future
+
+    def work(self):
+        while True:
+            item = self.orders.get()
+            if item is None:
+                self.orders.task_done()
+                break
+            future, instrument, units, on_fill = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    order = self.create_order(
+                        instrument,
+                        units,
+                        suppress=True,
+                        ret=True
+                    )
+                    if on_fill is not None:
+                        on_fill(order)
+                    future.set_result(order)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.orders.task_done()
+
+    def flush(self):
+        ''' Waits until all submitted orders are filled (or failed).
+        '''
+        self.orders.join()
+
+    def close(self):
+        ''' Stops the worker thread after the submitted orders.
+        '''
+        if self.thread is not None and self.thread.is_alive():
+            self.orders.put(None)
+            self.thread.join()
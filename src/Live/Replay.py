@@ -0,0 +1,210 @@
+import math
+import time
+import numpy as np
+import pandas as pd
+import tpqoa
+from src.Data.Columnar_Cache import read_columns
+
+
+class MarketReplay():
+    ''' Recorded prices (ticks or bars) replayed as a simulated market.
+
+    The first "warmup" prices serve as history, the remaining ones are streamed as ticks with
+    bid/ask = price -/+ spread / 2.
+    '''
+
+    def __init__(self, prices, spread=0.0, fill_latency=0.0, speed=None, warmup=1000):
+        '''
+        Parameters
+        ----------
+        prices: pd.Series
+            mid prices with a DatetimeIndex (UTC if naive)
+        spread: float
+            bid/ask spread in price units
+        fill_latency: float
+            seconds the simulated broker needs to fill an order
+        speed: float
+            replay speed as a multiple of real time (None = as fast as possible)
+        warmup: int
+            number of prices used as history before the stream starts
+        '''
+        prices = prices.dropna()
+        if prices.index.tz is None:
+            prices = prices.tz_localize("UTC")
+        self.prices = prices
+        self.spread = spread
+        self.fill_latency = fill_latency
+        self.speed = speed
+        self.warmup = warmup
+
+    def __repr__(self):
+        return f"MarketReplay(prices = {len(self.prices)}, spread = {self.spread}, fill_latency = {self.fill_latency}, speed = {self.speed})"
+
+    @classmethod
+    def from_csv(cls, filename, column="price", start=None, end=None, **kwargs):
+        ''' Creates a replay from a csv price file (e.g. five_minute.csv).
+        '''
+        return cls(read_columns(filename, [column], start, end)[column], **kwargs)
+
+    def history(self, bar_length, instrument):
+        ''' Returns the warmup prices as completed bars of "bar_length", as get_most_recent does.
+        '''
+        return self.prices.iloc[:self.warmup].to_frame(instrument).resample(
+            pd.to_timedelta(bar_length),
+            label="right"
+        ).last().dropna().iloc[:-1]
+
+    def ticks(self):
+        ''' Returns the streamed ticks as lists of ISO times, ns times, bids and asks.
+        '''
+        prices = self.prices.iloc[self.warmup:]
+        stamps = prices.index.as_unit("ns").asi8
+        times = np.datetime_as_string(stamps.view("datetime64[ns]"), unit="us")
+        mids = prices.to_numpy(dtype=np.float64)
+        return (
+            [f"{t}Z" for t in times],
+            stamps,
+            (mids - self.spread / 2).tolist(),
+            (mids + self.spread / 2).tolist()
+        )
+
+
+class SimulatedBroker(tpqoa.tpqoa):
+    ''' Offline stand-in for tpqoa's get_history, create_order and stream_data.
+
+    Takes a MarketReplay in place of the config file, so it can be combined with a trader
+    class through replay_class(). Orders are filled after the market's fill latency at the
+    current ask (buy) or bid (sell), and the realized P&L is computed on the net position.
+    '''
+
+    def __init__(self, conf_file):
+        if not isinstance(conf_file, MarketReplay):
+            raise TypeError("SimulatedBroker needs a MarketReplay instead of a config file")
+        self.market = conf_file
+        self.ticks = 0
+        self.time = None
+        self.bid = self.ask = math.nan
+        self.net_units = 0
+        self.avg_price = 0.0
+        self.orders = []
+        self.stream_seconds = 0.0
+        self.stop_stream = False
+
+    def get_history(self, instrument, start, end, granularity, price, localize=True):
+        ''' Returns the recorded prices between "start" and "end" as candles (at the recorded
+            frequency, whatever the granularity).
+        '''
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        prices = self.market.prices
+        start = start.tz_localize("UTC") if start.tz is None else start
+        end = end.tz_localize("UTC") if end.tz is None else end
+        prices = prices.loc[start:end]
+        prices = prices[prices.index < end]
+        df = pd.DataFrame(
+            {"o": prices, "h": prices, "l": prices, "c": prices, "volume": 1, "complete": True}
+        )
+        if localize:
+            df.index = df.index.tz_localize(None)
+        return df
+
+    def stream_data(self, instrument, stop=None, ret=False, callback=None):
+        ''' Replays the ticks through on_success (or "callback"), as tpqoa streams live prices.
+        '''
+        times, stamps, bids, asks = self.market.ticks()
+        self.ticks = 0
+        speed = self.market.speed
+        started = time.perf_counter()
+        for i in range(len(times)):
+            if speed is not None and i > 0:
+                wait = (stamps[i] - stamps[0]) / 1e9 / speed - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            self.ticks += 1
+            self.time = times[i]
+            self.bid = bids[i]
+            self.ask = asks[i]
+            if callback is not None:
+                callback(instrument, times[i], bids[i], asks[i])
+            else:
+                self.on_success(times[i], bids[i], asks[i])
+            if stop is not None and self.ticks >= stop:
+                break
+            if self.stop_stream:
+                break
+        self.stream_seconds = time.perf_counter() - started
+
+    def get_positions(self):
+        ''' Returns the simulated net position in tpqoa's format.
+        '''
+        if not self.net_units:
+            return []
+        long_units = max(self.net_units, 0)
+        short_units = min(self.net_units, 0)
+        return [{
+            "instrument": self.instrument,
+            "long": {"units": str(long_units)},
+            "short": {"units": str(short_units)},
+        }]
+
+    def create_order(self, instrument, units, price=None, sl_distance=None,
+                     tsl_distance=None, tp_price=None, comment=None,
+                     touch=False, suppress=False, ret=False):
+        ''' Fills a market order after the simulated latency.
+        '''
+        if self.market.fill_latency:
+            time.sleep(self.market.fill_latency)
+        fill = self.ask if units > 0 else self.bid
+        pl = 0.0
+        remaining = units
+        if self.net_units and (self.net_units > 0) != (units > 0):
+            direction = 1 if self.net_units > 0 else -1
+            closed = min(abs(units), abs(self.net_units))
+            pl = closed * direction * (fill - self.avg_price)
+            self.net_units -= closed * direction
+            remaining += closed * direction
+        if remaining:
+            total = self.net_units + remaining
+            self.avg_price = (self.avg_price * self.net_units + fill * remaining) / total
+            self.net_units = total
+        if self.net_units == 0:
+            self.avg_price = 0.0
+        order = {
+            "instrument": instrument,
+            "time": self.time,
+            "units": units,
+            "price": fill,
+            "pl": pl,
+        }
+        self.orders.append(order)
+        if not suppress:
+            print("\n\n", order, "\n")
+        if ret:
+            return order
+
+
+def replay_class(trader_class):
+    ''' Returns a subclass of a live trader class whose broker calls go to a SimulatedBroker.
+    '''
+    return type(f"Replay{trader_class.__name__}", (trader_class, SimulatedBroker), {})
+
+
+def run_replay(trader_class, market, *args, stop=None, **kwargs):
+    ''' Runs a live trader offline over a MarketReplay.
+
+    "args" and "kwargs" are the trader's arguments after the config file. Returns the trader
+    and the replay statistics (ticks per second, trades, P&L).
+    '''
+    trader = replay_class(trader_class)(market, *args, **kwargs)
+    trader.load_history(market.history(trader.bar_length, trader.instrument))
+    trader.stream_data(trader.instrument, stop=stop)
+    trader.executor.flush()
+    trader.journal.close()
+    stats = {
+        "ticks": trader.ticks,
+        "seconds": trader.stream_seconds,
+        "ticks_per_second": trader.ticks / trader.stream_seconds if trader.stream_seconds else math.nan,
+        "trades": len(trader.orders),
+        "pl": sum(order["pl"] for order in trader.orders),
+    }
+    return trader, stats
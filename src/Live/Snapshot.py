@@ -0,0 +1,159 @@
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+
+
+class TraderSnapshot():
+    ''' Periodic snapshot of a live trader's state for warm restarts.
+
+    The snapshot holds the bar history window, the incremental indicator state, the signal,
+    the position and the realized P&L. It is written atomically at most every "interval"
+    seconds. On restart, restore() reloads it, takes the position from the broker, and only
+    downloads the bars completed since the snapshot, so trading resumes within a bar instead
+    of after a full history backfill.
+    '''
+
+    def __init__(self, path, interval=60, reconcile=True):
+        '''
+        Parameters
+        ----------
+        path: str
+            snapshot file
+        interval: float
+            minimum number of seconds between two snapshots
+        reconcile: bool
+            take the position from the broker on restore (only valid if the trader is the only
+            one trading its instrument on the account)
+        '''
+        self.path = path
+        self.interval = interval
+        self.reconcile = reconcile
+        self.last_save = None
+
+    def __repr__(self):
+        return f"TraderSnapshot(path = {self.path}, interval = {self.interval})"
+
+    def maybe_save(self, trader):
+        ''' Saves the trader's state if the last snapshot is older than the interval.
+        '''
+        now = time.monotonic()
+        if self.last_save is None or now - self.last_save >= self.interval:
+            self.save(trader)
+            self.last_save = now
+
+    def save(self, trader):
+        ''' Writes the trader's state to the snapshot file (atomically).
+        '''
+        data = trader.raw_data
+        state = {
+            "instrument": trader.instrument,
+            "bar_length": trader.bar_length.value,
+            "parameters": trader.parameters,
+            "times": data.index.as_unit("ns").asi8.copy(),
+            "closes": data[trader.instrument].to_numpy(dtype=np.float64, copy=True),
+            "last_bar": trader.last_bar.value,
+            "last_signal_bar": None if trader.last_signal_bar is None else trader.last_signal_bar.value,
+            "indicators": trader.indicators,
+            "signal": trader.signal,
+            "position": trader.position,
+            "profits": list(trader.profits),
+        }
+        tmp = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        ''' Returns the saved state (None if there is no readable snapshot).
+        '''
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def broker_position(self, trader, saved):
+        ''' Returns the trader's position (in multiples of its units) held at the broker,
+            falling back to the saved position if the broker cannot be reached.
+        '''
+        try:
+            positions = trader.get_positions()
+        except Exception as e:
+            trader.journal.record(pd.Timestamp.now(tz="UTC"), trader.instrument, f"RECONCILE FAILED ({e})")
+            return saved
+        net_units = sum(
+            float(position["long"]["units"]) + float(position["short"]["units"])
+            for position in positions
+            if position["instrument"] == trader.instrument
+        )
+        position = net_units / trader.units
+        # anything but a flat, long or short position of exactly "units" is not the trader's own
+        if position not in (-1, 0, 1):
+            trader.journal.record(
+                pd.Timestamp.now(tz="UTC"),
+                trader.instrument,
+                f"RECONCILE MISMATCH (broker units {net_units:g}, saved position {saved})"
+            )
+            return saved
+        return int(position)
+
+    def restore(self, trader, now=None):
+        ''' Restores the trader from the snapshot and appends the bars completed since.
+
+        Snapshots of another instrument, bar length or strategy parameters are ignored. Otherwise
+        the P&L and the position (from the broker if "reconcile" is set) are restored. The history
+        and indicators are only reused if the missing bars still fit into the history window,
+        otherwise False is returned and the trader has to download its full history.
+        '''
+        state = self.load()
+        if state is None or state["instrument"] != trader.instrument or state["bar_length"] != trader.bar_length.value:
+            return False
+        if state.get("parameters") != trader.parameters:
+            trader.journal.record(pd.Timestamp.now(tz="UTC"), trader.instrument, "SNAPSHOT PARAMETERS CHANGED")
+            return False
+        trader.profits = state["profits"]
+        trader.journal.cum_pl = sum(trader.profits)
+        trader.journal.trades = len(trader.profits)
+        trader.position = self.broker_position(trader, state["position"]) if self.reconcile else state["position"]
+
+        now = pd.Timestamp.now(tz="UTC") if now is None else pd.Timestamp(now)
+        now = now.tz_localize("UTC") if now.tz is None else now
+        last_bar = pd.Timestamp(state["last_bar"], tz="UTC")
+        if now - last_bar > trader.history.max_bars * trader.bar_length:
+            trader.journal.record(now, trader.instrument, "SNAPSHOT TOO OLD")
+            return False
+
+        times = pd.DatetimeIndex(state["times"].view("datetime64[ns]")).tz_localize("UTC")
+        trader.history.reset(pd.DataFrame({trader.instrument: state["closes"]}, index=times))
+        trader.last_bar = last_bar
+        trader.indicators = state["indicators"]
+        trader.signal = state["signal"]
+        trader.last_signal_bar = None if state["last_signal_bar"] is None else pd.Timestamp(state["last_signal_bar"], tz="UTC")
+        self.catch_up(trader, now)
+        trader.journal.record(now, trader.instrument, "RESTORED")
+        return True
+
+    def catch_up(self, trader, now):
+        ''' Downloads the candles since the last bar of the trader, appends the completed bars
+            and updates the indicators with them.
+        '''
+        closes = trader.candles.update(
+            trader,
+            trader.instrument,
+            start=trader.last_bar.tz_convert(None),
+            end=now.tz_convert(None).floor("s"),
+            granularity="S5",
+            price="M"
+        )
+        bars = closes.to_frame(trader.instrument).resample(
+            trader.bar_length,
+            label="right"
+        ).last().dropna()
+        # bars ending after now are still open, and bars up to last_bar are already in the history
+        bars = bars[(bars.index > trader.last_bar) & (bars.index <= now)]
+        if len(bars):
+            trader.history.extend(bars)
+            trader.last_bar = trader.raw_data.index[-1]
+        trader.define_strategy()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+class TickBuffer():
+    ''' Preallocated NumPy buffer of tick timestamps (ns since epoch, UTC) and mid prices.
+
+    Appending a tick writes into the arrays without allocating. Consumed ticks are released
+    from the front; when the end of the arrays is reached the remaining ticks are moved back
+    to the front (or the arrays doubled if they are more than half full), so the buffered ticks
+    are always contiguous and can be handed out as zero-copy views.
+    '''
+
+    def __init__(self, capacity=2 ** 16):
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.start = 0
+        self.end = 0
+
+    def __repr__(self):
+        return f"TickBuffer(ticks = {len(self)}, capacity = {len(self.times)})"
+
+    def __len__(self):
+        return self.end - self.start
+
+    def append(self, time, price):
+        ''' Adds a tick given its timestamp in ns since epoch (UTC) and its mid price.
+        '''
+        if self.end == len(self.times):
+            self._make_room()
+        self.times[self.end] = time
+        self.prices[self.end] = price
+        self.end += 1
+
+    def _make_room(self):
+        n = len(self)
+        if 2 * n > len(self.times):
+            times = np.empty(2 * len(self.times), dtype=np.int64)
+            prices = np.empty(2 * len(self.prices), dtype=np.float64)
+        else:
+            times, prices = self.times, self.prices
+        times[:n] = self.times[self.start:self.end]
+        prices[:n] = self.prices[self.start:self.end]
+        self.times, self.prices = times, prices
+        self.start, self.end = 0, n
+
+    def view(self):
+        ''' Returns zero-copy views of the buffered timestamps and prices.
+        '''
+        return self.times[self.start:self.end], self.prices[self.start:self.end]
+
+    def keep_last(self, n=1):
+        ''' Releases all but the "n" most recent ticks.
+        '''
+        self.start = max(self.start, self.end - n)
+
+    def bars(self, bar_length):
+        ''' Builds the completed bars of length "bar_length" (ns) from the buffered ticks.
+
+        Returns the bar labels (right edge, ns since epoch) and the last price of each bar, with
+        empty bars forward filled, i.e. resample(bar_length, label="right").last().ffill().iloc[:-1].
+        '''
+        times, prices = self.view()
+        if len(times) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        bins = times // bar_length
+        all_bins = np.arange(bins[0], bins[-1])  # the bar of the latest tick is not completed
+        last = np.searchsorted(bins, all_bins, side="right") - 1
+        return (all_bins + 1) * bar_length, prices[last]
+
+    def bars_frame(self, bar_length, column):
+        ''' Returns the completed bars as a DataFrame with a UTC DatetimeIndex.
+        '''
+        labels, closes = self.bars(pd.to_timedelta(bar_length).value)
+        return pd.DataFrame(
+            {column: closes},
+            index=pd.to_datetime(labels, utc=True)
+        )
@@ -0,0 +1,118 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+
+class TradeJournal():
+    ''' Trade and event journal of a live trader with a running cumulative P&L.
+
+    Records are only enqueued on the trading path; a background thread appends them to a csv
+    file in batches and flushes the file once per batch. Console output is reduced to an
+    optional one-line summary printed at most every "summary_interval" seconds.
+    '''
+
+    FIELDS = ["time", "instrument", "event", "units", "price", "pl", "cum_pl"]
+
+    def __init__(self, path=None, summary_interval=None, batch_size=256, flush_interval=1.0):
+        '''
+        Parameters
+        ----------
+        path: str
+            csv file the records are appended to (None = keep only the running totals)
+        summary_interval: float
+            seconds between console summaries (None = no console output)
+        batch_size: int
+            maximum number of records written per flush
+        flush_interval: float
+            seconds the writer waits for more records before flushing a partial batch
+        '''
+        self.path = path
+        self.summary_interval = summary_interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records = queue.Queue()
+        self.thread = None
+        self.ticks = 0
+        self.trades = 0
+        self.cum_pl = 0.0
+        self.last_event = None
+        self.last_summary = time.monotonic()
+
+    def __repr__(self):
+        return f"TradeJournal(path = {self.path}, trades = {self.trades}, cum_pl = {self.cum_pl})"
+
+    def tick(self):
+        ''' Counts a tick and prints the summary when it is due.
+        '''
+        self.ticks += 1
+        if self.summary_interval is not None:
+            self.maybe_summary()
+
+    def trade(self, instrument, time, event, units, price, pl):
+        ''' Records a filled order (e.g. event = "GOING LONG") and updates the cumulative P&L.
+        '''
+        self.trades += 1
+        self.cum_pl += pl
+        self.record(time, instrument, event, units, price, pl)
+
+    def record(self, time, instrument, event, units=None, price=None, pl=None):
+        ''' Enqueues a record for the writer thread (a trade or any other event).
+        '''
+        self.last_event = f"{time} | {event}"
+        if self.path is None:
+            return
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+        self.records.put((time, instrument, event, units, price, pl, self.cum_pl))
+
+    def work(self):
+        new_file = not os.path.exists(self.path)
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.FIELDS)
+            done = False
+            while not done:
+                try:
+                    batch = [self.records.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    done = True
+                writer.writerows(record for record in batch if record is not None)
+                f.flush()
+                for _ in batch:
+                    self.records.task_done()
+
+    def maybe_summary(self):
+        now = time.monotonic()
+        if now - self.last_summary >= self.summary_interval:
+            self.last_summary = now
+            self.summary()
+
+    def summary(self):
+        ''' Prints one line with the tick and trade counts, the last event and the cumulative P&L.
+        '''
+        print(f"ticks = {self.ticks} | trades = {self.trades} | last = {self.last_event} | Cum P&L = {self.cum_pl:.2f}")
+
+    def flush(self):
+        ''' Waits until all records are written.
+        '''
+        if self.thread is not None and self.thread.is_alive():
+            self.records.join()
+
+    def close(self):
+        ''' Writes the remaining records and stops the writer thread.
+        '''
+        if self.thread is not None and self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join()
+        self.thread = None
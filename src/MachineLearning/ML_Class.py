@@ -1,8 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LogisticRegression
-import matplotlib.pyplot as plt
-plt.style.use("seaborn")
+from numpy.lib.stride_tricks import sliding_window_view
+from src.Data.Columnar_Cache import read_columns
+from src.Plotting.Plot_Style import pyplot
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "csv_files_example", "intraday_pairs.csv")
+
+
+def lag_matrix(returns, lags):
+    ''' Returns the lagged returns as a strided (len(returns), lags) view:
+        row t holds the returns t-1, ..., t-lags (NaN where not available).
+    '''
+    padded = np.concatenate((np.full(lags, np.nan), returns))
+    return sliding_window_view(padded, lags)[:-1, ::-1]
+
+
+def make_model(C=1e6, max_iter=100000):
+    ''' Returns the (unfitted) classification model (scikit-learn is only imported here).
+    '''
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(C=C, max_iter=max_iter, multi_class="ovr")
+
+
+_search_data = {}  # returns and lag matrix of a search worker process
+
+
+def _init_search(returns, max_lags, tc):
+    _search_data["returns"] = returns
+    _search_data["features"] = lag_matrix(returns, max_lags)
+    _search_data["tc"] = tc
+
+
+def evaluate_model(model, returns, features, lags, train_ratio, tc):
+    ''' Fits "model" and tests it exactly like test_strategy(), on the raw returns and the first
+        "lags" columns of a lag matrix. Returns performance, outperformance and number of trades.
+    '''
+    features = features[:, :lags]
+    split_index = int(len(returns) * train_ratio)
+    # rows left after prepare_features() on the training and the test set
+    train = slice(lags + 1, split_index)
+    test = slice(split_index - 1 + lags, len(returns))
+
+    model.fit(features[train], np.sign(returns[train]))
+    pred = model.predict(features[test])
+    trades = np.abs(np.diff(pred)).sum()
+    perf = np.exp(np.sum(pred * returns[test]) - trades * tc)
+    outperf = perf - np.exp(np.sum(returns[test]))
+    return round(perf, 6), round(outperf, 6), trades
+
+
+def _evaluate(lags, train_ratio, C, max_iter):
+    ''' Evaluates one parameter set on the data of a search worker process.
+    '''
+    return evaluate_model(
+        make_model(C, max_iter),
+        _search_data["returns"],
+        _search_data["features"],
+        lags,
+        train_ratio,
+        _search_data["tc"]
+    )
 
 
 class ML_Strategy():
@@ -10,7 +71,7 @@ class ML_Strategy():
         (Classification).
     '''
 
-    def __init__(self, ticker, start, end, tc):
+    def __init__(self, ticker, start, end, tc, C=1e6, max_iter=100000):
         '''
         Parameters
         ----------
@@ -22,17 +83,19 @@ class ML_Strategy():
             end date for data import
         tc: float
             proportional transaction costs per trade
+        C: float
+            inverse regularization strength of the logistic regression
+        max_iter: int
+            maximum number of solver iterations
         '''
         self.ticker = ticker
         self.start = start
         self.end = end
         self.tc = tc
-        self.model = LogisticRegression(
-            C=1e6,
-            max_iter=100000,
-            multi_class="ovr"
-        )
+        self.model = make_model(C, max_iter)
+        self.walk_forward_model = None  # last fit of walk_forward(), warm-started
         self.results = None
+        self.evaluated = None  # (train_ratio, lags) of a results frame still to build
         self.get_data()
 
     def __repr__(self):
@@ -45,13 +108,12 @@ class ML_Strategy():
     def get_data(self):
         ''' Imports the data from five_minute_pairs.csv file
         '''
-        raw = pd.read_csv(
-            "/Users/romain/trading-bot/src/csv_files_example/intraday_pairs.csv",
-            parse_dates=["time"],
-            index_col="time"
-        )
-        raw = raw[self.ticker].to_frame().dropna()
-        raw = raw.loc[self.start:self.end]
+        raw = read_columns(
+            DATA_FILE,
+            [self.ticker],
+            self.start,
+            self.end
+        ).dropna()
         raw.rename(columns={self.ticker: "price"}, inplace=True)
         raw["returns"] = np.log(raw / raw.shift(1))
         self.data = raw
@@ -129,6 +191,7 @@ class ML_Strategy():
         self.data_subset["creturns"] = self.data_subset["returns"].cumsum().apply(np.exp)
         self.data_subset["cstrategy"] = self.data_subset['strategy'].cumsum().apply(np.exp)
         self.results = self.data_subset
+        self.evaluated = None
 
         # absolute performance of the strategy
         perf = self.results["cstrategy"].iloc[-1]
@@ -137,19 +200,138 @@ class ML_Strategy():
 
         return round(perf, 6), round(outperf, 6)
 
+    def evaluate(self, train_ratio=0.7, lags=5):
+        '''
+        Backtests the ML-based strategy on the raw returns (no results frame).
+
+        Returns the absolute performance, the outperformance and the number of trades.
+
+        Parameters
+        ----------
+        train_ratio: float (between 0 and 1.0 excl.)
+            Splitting the dataset into training set (train_ratio)
+            and test set (1 - train_ratio).
+        lags: int
+            number of lags serving as model features.
+        '''
+        self.lags = lags
+        returns = self.data["returns"].to_numpy()
+        metrics = evaluate_model(self.model, returns, lag_matrix(returns, lags), lags, train_ratio, self.tc)
+        self.results = None
+        self.evaluated = (train_ratio, lags)
+        return metrics
+
+    def walk_forward(self, train_size, test_size, lags=5, window="rolling"):
+        '''
+        Backtests the ML-based strategy with periodic retraining.
+
+        The model is retrained every "test_size" bars on the preceding bars and predicts
+        the next "test_size" bars, which gives out-of-sample predictions for the whole
+        series after the first training window. Each fit starts from the previous
+        coefficients.
+
+        Parameters
+        ----------
+        train_size: int
+            number of bars in the (first) training window.
+        test_size: int
+            number of bars predicted before retraining.
+        lags: int
+            number of lags serving as model features.
+        window: str
+            "rolling" (fixed train_size) or "expanding" (all bars so far).
+        '''
+        if window not in ("rolling", "expanding"):
+            raise ValueError("window must be 'rolling' or 'expanding'")
+        self.lags = lags
+        self.feature_columns = ["lag{}".format(lag) for lag in range(1, lags + 1)]
+
+        returns = self.data["returns"].values
+        features = lag_matrix(returns, lags)
+        target = np.sign(returns)
+        first = lags + 1  # first bar with all lags and a return
+        if first + train_size >= len(returns):
+            raise ValueError("train_size leaves no bars for testing")
+
+        from sklearn.base import clone
+
+        model = clone(self.model).set_params(warm_start=True)
+        predictions = np.full(len(returns), np.nan)
+        for test_start in range(first + train_size, len(returns), test_size):
+            train_start = first if window == "expanding" else test_start - train_size
+            y = target[train_start:test_start]
+            # the previous coefficients only fit if the same classes are present
+            if hasattr(model, "classes_") and not np.array_equal(model.classes_, np.unique(y)):
+                model = clone(self.model).set_params(warm_start=True)
+            model.fit(features[train_start:test_start], y)
+            test_end = test_start + test_size
+            predictions[test_start:test_end] = model.predict(features[test_start:test_end])
+        # kept apart from self.model, so later static fits start fresh (and may use other lags)
+        self.walk_forward_model = model
+
+        data = self.data.iloc[first + train_size:].copy()
+        data["pred"] = predictions[first + train_size:]
+        data["strategy"] = data["pred"] * data["returns"]
+        data["trades"] = data["pred"].diff().fillna(0).abs()
+        data.strategy = data.strategy - data.trades * self.tc
+        data["creturns"] = data["returns"].cumsum().apply(np.exp)
+        data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
+        self.results = data
+        self.evaluated = None
+
+        perf = self.results["cstrategy"].iloc[-1]
+        outperf = perf - self.results["creturns"].iloc[-1]
+
+        return round(perf, 6), round(outperf, 6)
+
+    def search_parameters(self, lags_range, train_ratios, Cs=(1e6,),
+                          max_iters=(100000,), processes=None):
+        '''
+        Backtests every combination of lags, train_ratio, C and max_iter on a process pool
+        and ranks them by out-of-sample performance (net of tc).
+
+        The widest lag matrix is built once per worker and smaller lag counts use its first
+        columns. Every combination gives the same result as test_strategy() with that model.
+
+        Parameters
+        ----------
+        lags_range: tuple
+            tuple of the form (start, end, step size)
+        train_ratios, Cs, max_iters: iterable
+            values to search
+        processes: int
+            number of worker processes (defaults to the number of CPUs)
+        '''
+        combinations = list(product(range(*lags_range), train_ratios, Cs, max_iters))
+        returns = self.data["returns"].values
+        max_lags = max(combination[0] for combination in combinations)
+
+        with ProcessPoolExecutor(
+            processes,
+            initializer=_init_search,
+            initargs=(returns, max_lags, self.tc)
+        ) as pool:
+            results = list(pool.map(_evaluate, *zip(*combinations), chunksize=4))
+
+        many_results = pd.DataFrame(data=combinations, columns=["lags", "train_ratio", "C", "max_iter"])
+        many_results[["performance", "outperformance", "trades"]] = results
+        many_results = many_results.sort_values("performance", ascending=False, ignore_index=True)
+        self.results_overview = many_results
+
+        return many_results.iloc[0]
+
     def plot_results(self):
         ''' Plots the performance of the trading strategy
             and compares to "buy and hold".
         '''
+        if self.results is None and self.evaluated is not None:
+            self.test_strategy(*self.evaluated)  # builds the results frame of the last evaluate()
         if self.results is None:
             print("Run test_strategy() first.")
         else:
+            pyplot()
             title = f"Logistic Regression: {self.ticker} | TC = {self.tc}"
             self.results[["creturns", "cstrategy"]].plot(
                 title=title,
                 figsize=(12, 8)
             )
-
-
-ml = ML_Strategy("EURUSD", "2019-01-01", "2020-08-31", 0)
-print(ml.test_strategy(0.7, 5))
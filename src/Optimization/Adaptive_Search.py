@@ -0,0 +1,137 @@
+import math
+import numpy as np
+
+
+def _score(performance):
+    ''' Ranking key of an evaluation (missing performances rank last).
+    '''
+    return -np.inf if performance is None or np.isnan(performance) else performance
+
+
+def _combination(space, indices):
+    return tuple(values[i] for values, i in zip(space, indices))
+
+
+def random_search(space, objective, budget, seed = None):
+    ''' Evaluates "budget" distinct combinations drawn uniformly from the parameter space.
+
+    Parameters
+    ----------
+    space: list
+        values of each parameter (e.g. [range(10, 50), range(100, 252)])
+    objective: callable
+        objective(combination, fraction) returning the performance of a combination on the
+        first "fraction" of the data
+    budget: int
+        number of evaluations
+    seed: int
+        seed of the random generator
+
+    Returns the evaluated combinations and their performances.
+    '''
+    rng = np.random.default_rng(seed)
+    shape = [len(values) for values in space]
+    total = math.prod(shape)
+    draws = rng.choice(total, size = min(budget, total), replace = False)
+    combinations = [_combination(space, indices) for indices in zip(*np.unravel_index(draws, shape))]
+    return combinations, [objective(combination, 1.0) for combination in combinations]
+
+
+def successive_halving(space, objective, budget, eta = 3, rungs = 3, seed = None):
+    ''' Evaluates random combinations on growing prefixes of the data and keeps the best
+        1 / "eta" of them at each rung, so most combinations only cost a fraction of a full backtest.
+
+    The first rung uses 1 / eta ** (rungs - 1) of the data and the last rung all of it. Each rung
+    costs about the same, so "budget" (in full-data evaluations) is split evenly across rungs.
+    Only the last rung is returned, so every performance is measured on the full data.
+    '''
+    rng = np.random.default_rng(seed)
+    shape = [len(values) for values in space]
+    total = math.prod(shape)
+    count = min(total, max(eta ** (rungs - 1), int(budget * eta ** (rungs - 1) / rungs)))
+    draws = rng.choice(total, size = count, replace = False)
+    combinations = [_combination(space, indices) for indices in zip(*np.unravel_index(draws, shape))]
+
+    for rung in range(rungs):
+        fraction = eta ** (rung - rungs + 1)
+        performances = [objective(combination, fraction) for combination in combinations]
+        if rung == rungs - 1:
+            break
+        keep = max(1, math.ceil(len(combinations) / eta))
+        order = sorted(range(len(combinations)), key = lambda i: _score(performances[i]), reverse = True)
+        combinations = [combinations[i] for i in order[:keep]]
+    return combinations, performances
+
+
+def _density(points, size, bandwidth):
+    ''' Parzen estimate over the indices 0 .. size - 1 (Gaussian kernels plus a uniform prior).
+    '''
+    grid = np.arange(size)[:, None]
+    kernels = np.exp(-0.5 * ((grid - np.asarray(points)[None, :]) / bandwidth) ** 2).sum(axis = 1)
+    density = kernels / kernels.sum() * len(points) + 1 / size
+    return density / density.sum()
+
+
+def tpe_search(space, objective, budget, seed = None, startup = None, gamma = 0.25, candidates = 24):
+    ''' Tree-structured Parzen estimator over the parameter indices.
+
+    After "startup" random evaluations, the evaluations are split into the best "gamma" share
+    and the rest, each modelled by an independent Parzen density per parameter. Candidates are
+    sampled around the good evaluations and the one maximizing the ratio of good to bad density
+    is evaluated next. Combinations are never evaluated twice.
+    '''
+    rng = np.random.default_rng(seed)
+    shape = [len(values) for values in space]
+    total = math.prod(shape)
+    budget = min(budget, total)
+    startup = min(budget, startup or max(10, 2 * len(space) + 1))
+
+    evaluated = {}
+    for flat in rng.choice(total, size = startup, replace = False):
+        evaluated[int(flat)] = objective(_combination(space, np.unravel_index(flat, shape)), 1.0)
+
+    while len(evaluated) < budget:
+        keys = sorted(evaluated, key = lambda flat: _score(evaluated[flat]), reverse = True)
+        split = max(1, int(math.ceil(gamma * len(keys))))
+        good = np.array(np.unravel_index(keys[:split], shape))
+        bad = np.array(np.unravel_index(keys[split:] or keys[-1:], shape))
+
+        sampled = np.empty((len(shape), candidates), dtype = int)
+        ratio = np.zeros(candidates)
+        for d, size in enumerate(shape):
+            bandwidth = max(1.0, size / (1 + len(keys)) ** 0.5)
+            centers = rng.choice(good[d], size = candidates)
+            sampled[d] = np.clip(np.rint(centers + rng.normal(0, bandwidth, candidates)), 0, size - 1)
+            ratio += np.log(_density(good[d], size, bandwidth)[sampled[d]])
+            ratio -= np.log(_density(bad[d], size, bandwidth)[sampled[d]])
+
+        flat = None
+        for i in np.argsort(-ratio):
+            candidate = int(np.ravel_multi_index(sampled[:, i], shape))
+            if candidate not in evaluated:
+                flat = candidate
+                break
+        while flat is None: # all candidates seen: fall back to a random new combination
+            candidate = int(rng.integers(total))
+            flat = candidate if candidate not in evaluated else None
+        evaluated[flat] = objective(_combination(space, np.unravel_index(flat, shape)), 1.0)
+
+    combinations = [_combination(space, np.unravel_index(flat, shape)) for flat in evaluated]
+    return combinations, list(evaluated.values())
+
+
+SEARCHES = {
+    "random": random_search,
+    "halving": successive_halving,
+    "tpe": tpe_search,
+}
+
+
+def adaptive_search(search, space, objective, budget, seed = None, **kwargs):
+    ''' Runs one of the SEARCHES ("random", "halving" or "tpe") over the parameter space.
+
+    Returns the combinations evaluated on the full data and their performances.
+    '''
+    if search not in SEARCHES:
+        raise ValueError(f"search must be 'grid' or one of {sorted(SEARCHES)}")
+    return SEARCHES[search](space, objective, budget, seed = seed, **kwargs)
@@ -0,0 +1,157 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from src.Data.Columnar_Cache import read_columns
+from src.SMA.SMA_Strategy import grid_performance
+from src.Bollinger.Bollinger_Strategy import gap_performance, parameter_values
+
+
+def sma_scores(price, SMA_short_windows, SMA_long_windows, trading_cost):
+    ''' Scores a shard of the SMA grid (row-major over SMA_short, SMA_long).
+    '''
+    return grid_performance(price, SMA_short_windows, SMA_long_windows).ravel()
+
+
+def bollinger_scores(price, SMA_windows, gaps, trading_cost):
+    ''' Scores a shard of the Bollinger grid (row-major over SMA, gap).
+    '''
+    return np.concatenate([gap_performance(price, SMA, gaps, trading_cost) for SMA in SMA_windows])
+
+
+STRATEGIES = {
+    "sma": (sma_scores, ["SMA_short", "SMA_long"]),
+    "bollinger": (bollinger_scores, ["SMA", "gap"]),
+}
+
+_attached = {} # shared memory blocks attached by a worker process, by name
+
+
+def _attach(name, length):
+    ''' Maps a price array published by the parent process without copying it.
+    '''
+    if name not in _attached:
+        try:
+            block = shared_memory.SharedMemory(name = name, track = False)
+        except TypeError: # Python < 3.13 has no "track" argument
+            block = shared_memory.SharedMemory(name = name)
+        _attached[name] = block
+    return np.ndarray((length,), dtype = np.float64, buffer = _attached[name].buf)
+
+
+def _run_shard(strategy, name, length, first_values, second_values, trading_cost):
+    score = STRATEGIES[strategy][0]
+    return score(_attach(name, length), first_values, second_values, trading_cost)
+
+
+def load_prices(filename, tickers = None, start = None, end = None):
+    ''' Loads the price series of several tickers (e.g. from intraday_pairs.csv or forex_pairs.csv).
+
+    Returns a dict mapping each ticker to its price Series without missing values.
+    '''
+    raw = read_columns(filename, tickers, start, end)
+    return {ticker: raw[ticker].dropna() for ticker in raw.columns}
+
+
+class ParallelRunner():
+    ''' Runs the SMA or Bollinger parameter optimization across a process pool.
+
+    The parameter grid (and optionally several tickers) is split into shards. Price arrays are
+    shared with the workers through shared memory instead of being pickled per task.
+    '''
+
+    def __init__(self, strategy, prices, trading_cost = 0, processes = None):
+        '''
+        Parameters
+        ----------
+        strategy: str
+            "sma" or "bollinger"
+        prices: dict
+            ticker -> price Series or array
+        trading_cost: float
+            proportional transaction/trading costs per trade (Bollinger only)
+        processes: int
+            number of worker processes (defaults to the number of CPUs)
+        '''
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, choose from {list(STRATEGIES)}")
+        self.strategy = strategy
+        self.prices = prices
+        self.trading_cost = trading_cost
+        self.processes = processes or os.cpu_count()
+        self.results_overview = None
+
+    def __repr__(self):
+        return f"ParallelRunner(strategy = {self.strategy}, tickers = {list(self.prices)}, processes = {self.processes})"
+
+    @classmethod
+    def from_csv(cls, strategy, filename, tickers = None, start = None, end = None, **kwargs):
+        ''' Creates a runner for several tickers of a csv file.
+        '''
+        return cls(strategy, load_prices(filename, tickers, start, end), **kwargs)
+
+    def optimize_parameters(self, first_range, second_range, shards_per_process = 4):
+        ''' Finds the optimal parameters for every ticker.
+
+        Parameters
+        ----------
+        first_range, second_range: tuple
+            tuples of the form (start, end, step size), i.e. (SMA_short, SMA_long) for "sma"
+            and (SMA, gap) for "bollinger"
+        shards_per_process: int
+            number of shards per worker and ticker, to balance the load
+        '''
+        first_values = list(range(*first_range))
+        second_values = parameter_values(second_range)
+        n_shards = max(1, self.processes * shards_per_process)
+        first_shards = [list(shard) for shard in np.array_split(first_values, min(len(first_values), n_shards)) if len(shard)]
+        # the second axis is split as well when there are fewer first values than shards, so that
+        # every shard only scores (and holds the moving averages of) a block of the grid
+        n_blocks = max(1, min(len(second_values), n_shards // max(len(first_shards), 1)))
+        second_shards = [list(shard) for shard in np.array_split(second_values, n_blocks) if len(shard)]
+
+        blocks = {}
+        try:
+            for ticker, price in self.prices.items():
+                price = np.asarray(price, dtype = np.float64)
+                block = shared_memory.SharedMemory(create = True, size = max(price.nbytes, 1))
+                np.ndarray(price.shape, dtype = np.float64, buffer = block.buf)[:] = price
+                blocks[ticker] = (block, len(price))
+
+            with ProcessPoolExecutor(self.processes) as pool:
+                futures = [
+                    (ticker, first_shard, [
+                        pool.submit(_run_shard, self.strategy, block.name, length,
+                                    first_shard, second_shard, self.trading_cost)
+                        for second_shard in second_shards
+                    ])
+                    for ticker, (block, length) in blocks.items() for first_shard in first_shards
+                ]
+                frames = []
+                for ticker, first_shard, shard_futures in futures:
+                    # the blocks of the second axis are put side by side again (row-major order)
+                    scores = np.hstack([
+                        future.result().reshape(len(first_shard), -1) for future in shard_futures
+                    ])
+                    frame = pd.DataFrame(list(product(first_shard, second_values)), columns = STRATEGIES[self.strategy][1])
+                    frame.insert(0, "ticker", ticker)
+                    frame["performance"] = np.round(scores.ravel(), 6)
+                    frames.append(frame)
+        finally:
+            for block, _ in blocks.values():
+                block.close()
+                block.unlink()
+
+        self.results_overview = pd.concat(frames, ignore_index = True)
+        return self.best_parameters()
+
+    def best_parameters(self):
+        ''' Returns the best parameter combination and performance of every ticker.
+        '''
+        if self.results_overview is None:
+            print("Run optimize_parameters() first.")
+        else:
+            best = self.results_overview.groupby("ticker", sort = False)["performance"].idxmax()
+            return self.results_overview.loc[best].set_index("ticker")
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from src.Data.Columnar_Cache import read_columns
+from src.SMA.SMA_Strategy import price_cumsum, rolling_means
+from src.Bollinger.Bollinger_Strategy import band_positions, parameter_values
+from src.Plotting.Plot_Style import pyplot
+
+
+def sma_positions(price, SMA_short_windows, SMA_long_windows, block_size):
+    ''' Yields blocks of (combinations, positions) of the SMA crossover over the full history
+        (neutral until both moving averages are defined). The long moving averages are computed
+        per block of SMA_long windows, like in grid_performance().
+    '''
+    cumsum = price_cumsum(price)
+    short_means = rolling_means(price, SMA_short_windows, cumsum)
+    chunk = max(1, block_size // max(len(price), 1))
+    for j in range(0, len(SMA_long_windows), chunk):
+        block = SMA_long_windows[j:j + chunk]
+        long_means = rolling_means(price, block, cumsum)
+        for i, SMA_short in enumerate(SMA_short_windows):
+            position = (short_means[i] > long_means).astype(np.float64)
+            position *= 2
+            position -= 1
+            for row, SMA_long in enumerate(block):
+                position[row, :max(SMA_short, SMA_long) - 1] = 0.0
+            yield [(SMA_short, SMA_long) for SMA_long in block], position
+
+
+def bollinger_positions(price, SMA_windows, gaps, block_size):
+    ''' Yields blocks of (combinations, positions) of the Bollinger Bands strategy over the
+        full history; the rolling statistics are computed once per SMA window.
+    '''
+    series = pd.Series(price)
+    chunk = max(1, block_size // max(len(price), 1))
+    for SMA in SMA_windows:
+        mean = series.rolling(SMA).mean().values
+        std = series.rolling(SMA).std().values
+        for j in range(0, len(gaps), chunk):
+            yield [(SMA, gap) for gap in gaps[j:j + chunk]], band_positions(price, mean, std, gaps[j:j + chunk])
+
+
+STRATEGIES = {
+    "sma": (sma_positions, ["SMA_short", "SMA_long"]),
+    "bollinger": (bollinger_positions, ["SMA", "gap"]),
+}
+
+
+class WalkForward():
+    ''' Walk-forward optimization of the SMA or Bollinger strategy.
+
+    Train and test windows slide across the series: the parameters with the best in-sample
+    performance of each training window are traded on the following test window, and the
+    out-of-sample results are stitched into one equity curve. Indicators and positions are
+    computed once over the full history for every combination; the in-sample performance of
+    all windows is then read from cumulative strategy returns, so a study with hundreds of
+    windows costs about as much as one grid search.
+    '''
+
+    def __init__(self, strategy, price, trading_cost = 0):
+        '''
+        Parameters
+        ----------
+        strategy: str
+            "sma" or "bollinger"
+        price: pd.Series
+            prices with a DatetimeIndex
+        trading_cost: float
+            proportional transaction/trading costs per trade
+        '''
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}, choose from {list(STRATEGIES)}")
+        self.strategy = strategy
+        self.price = price.dropna()
+        self.trading_cost = trading_cost
+        self.windows = None
+        self.results = None
+
+    def __repr__(self):
+        return f"WalkForward(strategy = {self.strategy}, bars = {len(self.price)}, trading_cost = {self.trading_cost})"
+
+    @classmethod
+    def from_csv(cls, strategy, filename, ticker, start = None, end = None, **kwargs):
+        ''' Creates a walk-forward study for one ticker of a csv file.
+        '''
+        return cls(strategy, read_columns(filename, [ticker], start, end)[ticker], **kwargs)
+
+    def split(self, train_size, test_size, window = "rolling"):
+        ''' Returns the (train_start, test_start, test_end) bar positions of every window.
+        '''
+        if window not in ("rolling", "expanding"):
+            raise ValueError("window must be 'rolling' or 'expanding'")
+        n = len(self.price)
+        return [
+            (0 if window == "expanding" else test_start - train_size, test_start, min(test_start + test_size, n))
+            for test_start in range(train_size, n - 1, test_size)
+        ]
+
+    def run(self, first_range, second_range, train_size, test_size, window = "rolling", block_size = 2 ** 22):
+        ''' Optimizes the parameters on every training window and backtests them out-of-sample.
+
+        Parameters
+        ----------
+        first_range, second_range: tuple
+            tuples of the form (start, end, step size), i.e. (SMA_short, SMA_long) for "sma"
+            and (SMA, gap) for "bollinger"
+        train_size, test_size: int
+            number of bars of the (first) training window and of each test window
+        window: str
+            "rolling" (fixed train_size) or "expanding" (all bars so far)
+        block_size: int
+            number of position values (and long moving average values for "sma") held in memory
+            at once; the short moving averages of "sma" are held for all windows
+        '''
+        positions, names = STRATEGIES[self.strategy]
+        price = self.price.to_numpy(dtype = np.float64, copy = True)
+        returns = np.zeros(len(price))
+        returns[1:] = np.log(price[1:] / price[:-1])
+        windows = self.split(train_size, test_size, window)
+        if not windows:
+            raise ValueError("train_size leaves no bars for testing")
+        train_start, test_start, test_end = (np.array(bounds) for bounds in zip(*windows))
+
+        # in-sample log performance of window w = cumulative[test_start - 1] - cumulative[train_start],
+        # with cumulative[t] the log return (net of costs) earned over bars 1 .. t; only these
+        # boundaries are needed, so each block is summed per segment between consecutive boundaries
+        boundaries, inverse = np.unique(np.concatenate(([0], train_start, test_start - 1)), return_inverse = True)
+        first, last = inverse[1:len(windows) + 1], inverse[len(windows) + 1:]
+
+        best_score = np.full(len(windows), -np.inf)
+        best_combination = [None] * len(windows)
+        best_position = [None] * len(windows)
+        for combinations, position in positions(price, list(range(*first_range)), parameter_values(second_range), block_size):
+            # bar t is earned with the position of t - 1
+            strategy = position[:, :-1] * returns[1:]
+            if self.trading_cost:
+                strategy -= np.abs(np.diff(position, axis = 1)) * self.trading_cost
+            segments = np.add.reduceat(strategy, boundaries, axis = 1)
+            cumulative = np.zeros((len(position), len(boundaries)))
+            np.cumsum(segments[:, :len(boundaries) - 1], axis = 1, out = cumulative[:, 1:])
+            scores = cumulative[:, last] - cumulative[:, first]
+            rows = np.argmax(scores, axis = 0)
+            candidates = scores[rows, np.arange(len(windows))]
+            # ties go to the first combination of the grid, whatever order the blocks come in
+            ties = [w for w in np.flatnonzero(candidates == best_score) if combinations[rows[w]] < best_combination[w]]
+            for w in [*np.flatnonzero(candidates > best_score), *ties]:
+                best_score[w] = scores[rows[w], w]
+                best_combination[w] = combinations[rows[w]]
+                best_position[w] = position[rows[w], test_start[w]:test_end[w]].copy()
+
+        data = self.price.iloc[test_start[0]:test_end[-1]].to_frame("price")
+        data["returns"] = returns[test_start[0]:test_end[-1]]
+        data["position"] = np.concatenate(best_position)
+        data["strategy"] = data.position.shift(1) * data["returns"]
+        data.dropna(inplace = True)
+
+        # determine the number of trades in each bar (incl. parameter changes between windows)
+        data["trades"] = data.position.diff().fillna(0).abs()
+        data.strategy = data.strategy - data.trades * self.trading_cost
+
+        data["creturns"] = data["returns"].cumsum().apply(np.exp)
+        data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
+        self.results = data
+
+        index = self.price.index
+        overview = pd.DataFrame({
+            "train_start": index[train_start],
+            "test_start": index[test_start],
+            "test_end": index[test_end - 1],
+        })
+        overview[names] = pd.DataFrame(best_combination, columns = names)
+        overview["in_sample"] = np.round(np.exp(best_score), 6)
+        window_of_bar = np.searchsorted(test_start, np.arange(test_start[0] + 1, test_end[-1]), side = "right") - 1
+        overview["out_of_sample"] = np.round(np.exp(np.bincount(
+            window_of_bar, weights = data["strategy"].to_numpy(), minlength = len(windows)
+        )), 6)
+        self.windows = overview
+
+        perf = data["cstrategy"].iloc[-1] # absolute out-of-sample performance
+        outperf = perf - data["creturns"].iloc[-1] # out-/underperformance of the stitched strategy
+
+        return round(perf, 6), round(outperf, 6)
+
+    def plot_results(self):
+        ''' Plots the stitched out-of-sample performance and compares to "buy and hold".
+        '''
+        if self.results is None:
+            print("Run run() first.")
+        else:
+            pyplot()
+            title = f"Walk-forward {self.strategy} | trading_cost = {self.trading_cost}"
+            self.results[["creturns", "cstrategy"]].plot(title = title, figsize = (12, 8))
@@ -0,0 +1,15 @@
+_styled = False
+
+
+def pyplot():
+    ''' Imports matplotlib on first use and applies the seaborn style, so that only plotting
+        pays for the import.
+    '''
+    global _styled
+    import matplotlib.pyplot as plt
+
+    if not _styled:
+        # the style was renamed in matplotlib 3.6
+        plt.style.use("seaborn" if "seaborn" in plt.style.available else "seaborn-v0_8")
+        _styled = True
+    return plt
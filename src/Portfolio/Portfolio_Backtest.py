@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as np
+from src.Data.Columnar_Cache import read_columns
+from src.Plotting.Plot_Style import pyplot
+
+PARAMETERS = {
+    "sma": ("SMA_short", "SMA_long"),
+    "bollinger": ("SMA", "gap"),
+}
+
+
+class PortfolioBacktest():
+    ''' Class for the vectorized backtesting of SMA or Bollinger Bands strategies on all
+        instruments of a csv file at once, as a (bars x instruments) matrix.
+    '''
+
+    def __init__(self, filename, strategy, params, start=None, end=None, weights=None,
+                 trading_cost=0, tickers=None):
+        '''
+        Parameters
+        ----------
+        filename: str
+            csv file with one price column per instrument (e.g. intraday_pairs.csv)
+        strategy: str
+            "sma" or "bollinger"
+        params: dict
+            SMA_short and SMA_long ("sma") or SMA and gap ("bollinger"), each either shared
+            by all instruments or a dict ticker -> value
+        start: str
+            start date for data import
+        end: str
+            end date for data import
+        weights: dict
+            ticker -> portfolio weight (defaults to equal weights), rebalanced every bar
+        trading_cost: float
+            proportional transaction/trading costs per trade
+        tickers: list
+            instruments to backtest (defaults to all columns)
+        '''
+        if strategy not in PARAMETERS:
+            raise ValueError(f"Unknown strategy {strategy!r}, choose from {list(PARAMETERS)}")
+        self.filename = filename
+        self.strategy = strategy
+        self.params = params
+        self.start = start
+        self.end = end
+        self.trading_cost = trading_cost
+        self.results = None
+        self.instrument_results = None
+        self.get_data(tickers)
+        self.set_weights(weights)
+
+    def __repr__(self):
+        return f"PortfolioBacktest(strategy = {self.strategy}, tickers = {self.tickers}, params = {self.params}, start = {self.start}, end = {self.end})"
+
+    def get_data(self, tickers=None):
+        ''' Imports the prices of all instruments on their common time axis. Gaps of an
+            instrument are forward filled (flat bars), so its windows count them as bars.
+        '''
+        prices = read_columns(self.filename, tickers, self.start, self.end)
+        prices = prices.dropna(how="all").ffill()
+        self.tickers = list(prices.columns)
+        self.prices = prices
+        self.returns = np.log(prices / prices.shift(1))
+
+    def set_weights(self, weights=None):
+        if weights is None:
+            self.weights = np.full(len(self.tickers), 1 / len(self.tickers))
+        else:
+            self.weights = np.array([weights.get(ticker, 0) for ticker in self.tickers], dtype=float)
+
+    def parameter(self, name):
+        ''' Returns the value of a parameter for every instrument.
+        '''
+        value = self.params[name]
+        if isinstance(value, dict):
+            return [value[ticker] for ticker in self.tickers]
+        return [value] * len(self.tickers)
+
+    def rolling(self, windows, statistic):
+        ''' Rolling mean or std with one window per instrument (one pass per distinct window).
+        '''
+        result = pd.DataFrame(np.nan, index=self.prices.index, columns=self.tickers)
+        for window in set(windows):
+            columns = [t for t, w in zip(self.tickers, windows) if w == window]
+            result[columns] = getattr(self.prices[columns].rolling(window), statistic)()
+        return result.values
+
+    def positions(self):
+        ''' Returns the position matrix and the matrix of bars with valid indicators.
+        '''
+        price = self.prices.values
+        valid = ~np.isnan(self.returns.values)
+        if self.strategy == "sma":
+            short = self.rolling(self.parameter("SMA_short"), "mean")
+            long = self.rolling(self.parameter("SMA_long"), "mean")
+            valid &= ~(np.isnan(short) | np.isnan(long))
+            position = np.where(short > long, 1.0, -1.0)
+        else:
+            SMA = self.rolling(self.parameter("SMA"), "mean")
+            std = self.rolling(self.parameter("SMA"), "std")
+            gap = np.array(self.parameter("gap"), dtype=float)
+            valid &= ~(np.isnan(SMA) | np.isnan(std))
+            distance = price - SMA
+            crossed = np.zeros_like(valid)
+            crossed[1:] = distance[1:] * distance[:-1] < 0
+            position = np.where(price < SMA - std * gap, 1.0, np.nan)
+            position = np.where(price > SMA + std * gap, -1.0, position)
+            position = np.where(crossed, 0.0, position)
+            position[~valid] = 0.0  # start neutral, then forward fill
+            position = pd.DataFrame(position).ffill().to_numpy(copy=True)
+        position[~valid] = 0.0
+        return position, valid
+
+    def test_strategy(self):
+        ''' Backtests the strategy on all instruments and the weighted portfolio.
+        '''
+        position, valid = self.positions()
+        returns = np.nan_to_num(self.returns.values)
+
+        # a bar counts once the previous bar had a position, trades from the bar after
+        active = np.zeros_like(valid)
+        active[1:] = valid[1:] & valid[:-1]
+        counted = np.zeros_like(valid)
+        counted[1:] = active[1:] & active[:-1]
+        trades = np.zeros_like(position)
+        trades[1:] = np.abs(np.diff(position, axis=0))
+        trades[~counted] = 0
+
+        strategy = np.zeros_like(position)
+        strategy[1:] = position[:-1] * returns[1:]
+        strategy = np.where(active, strategy - trades * self.trading_cost, 0.0)
+        benchmark = np.where(active, returns, 0.0)
+
+        index = self.prices.index
+        self.instrument_results = pd.concat({
+            "creturns": pd.DataFrame(np.exp(np.cumsum(benchmark, axis=0)), index=index, columns=self.tickers),
+            "cstrategy": pd.DataFrame(np.exp(np.cumsum(strategy, axis=0)), index=index, columns=self.tickers),
+            "trades": pd.DataFrame(trades, index=index, columns=self.tickers),
+        }, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+        # the portfolio is rebalanced to the weights every bar
+        self.results = pd.DataFrame({
+            "returns": np.log1p(np.expm1(benchmark) @ self.weights),
+            "strategy": np.log1p(np.expm1(strategy) @ self.weights),
+        }, index=index)
+        self.results["creturns"] = self.results["returns"].cumsum().apply(np.exp)
+        self.results["cstrategy"] = self.results["strategy"].cumsum().apply(np.exp)
+
+        perf = self.results["cstrategy"].iloc[-1] # absolute performance of the portfolio
+        outperf = perf - self.results["creturns"].iloc[-1] # out-/underperformance of the portfolio
+
+        return round(perf, 6), round(outperf, 6)
+
+    def instrument_performance(self):
+        ''' Returns performance, outperformance and number of trades per instrument.
+        '''
+        if self.instrument_results is None:
+            print("Run test_strategy() first.")
+        else:
+            last = self.instrument_results.iloc[-1].unstack()
+            return pd.DataFrame({
+                "performance": last["cstrategy"].round(6),
+                "outperformance": (last["cstrategy"] - last["creturns"]).round(6),
+                "trades": self.instrument_results.xs("trades", axis=1, level=1).sum(),
+            })
+
+    def plot_results(self, instruments=False):
+        ''' Plots the performance of the portfolio (or of every instrument) compared to "buy and hold".
+        '''
+        if self.results is None:
+            print("Run test_strategy() first.")
+            return
+        pyplot()
+        if instruments:
+            title = f"{self.strategy} | {self.params} | trading_cost = {self.trading_cost}"
+            self.instrument_results.xs("cstrategy", axis=1, level=1).plot(title=title, figsize=(12, 8))
+        else:
+            title = f"Portfolio {self.tickers} | {self.strategy} | {self.params} | trading_cost = {self.trading_cost}"
+            self.results[["creturns", "cstrategy"]].plot(title=title, figsize=(12, 8))
@@ -1,8 +1,109 @@
 from itertools import product
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-plt.style.use("seaborn")
+from src.Data.Columnar_Cache import read_columns
+from src.Optimization.Adaptive_Search import adaptive_search
+from src.Plotting.Plot_Style import pyplot
+
+
+def price_cumsum(price):
+    ''' Cumulative sum used by rolling_means(), with a leading 0.
+    '''
+    # shifting by the first price keeps the cumulative sum small and the differences precise
+    return np.concatenate(([0.0], np.cumsum(price - price[0])))
+
+
+def rolling_means(price, windows, cumsum = None):
+    ''' Computes the simple moving averages of "price" for all "windows" from a single cumulative sum.
+
+    Returns an array of shape (len(windows), len(price)) that is NaN until a window is filled.
+    "cumsum" can pass price_cumsum(price) when the means are computed in several batches.
+    '''
+    price = np.asarray(price, dtype = float)
+    windows = np.asarray(windows, dtype = int)
+    if cumsum is None:
+        cumsum = price_cumsum(price)
+    means = np.full((len(windows), len(price)), np.nan)
+    for i, window in enumerate(windows):
+        if 0 < window <= len(price):
+            means[i, window - 1:] = (cumsum[window:] - cumsum[:-window]) / window + price[0]
+    return means
+
+
+def grid_performance(price, SMA_short_windows, SMA_long_windows, block_size = 2 ** 22):
+    ''' Scores every (SMA_short, SMA_long) pair at once.
+
+    Returns the (len(SMA_short_windows), len(SMA_long_windows)) matrix of absolute strategy
+    performances, equal to what test_strategy() returns for each pair (NaN if no data is left).
+    '''
+    price = np.asarray(price, dtype = float)
+    short_windows = np.asarray(SMA_short_windows, dtype = int)
+    long_windows = np.asarray(SMA_long_windows, dtype = int)
+    n = len(price)
+    returns = np.zeros(n)
+    returns[1:] = np.log(price[1:] / price[:-1])
+    # the first two returns never count: the first is NaN and the first position is only known from bar 1
+    returns[:2] = 0
+    suffix = np.concatenate((np.cumsum(returns[::-1])[::-1], [0.0]))
+
+    # the long moving averages are computed per block of windows, so only block_size of them
+    # are held in memory at once (the short ones are usually few, or split by ParallelRunner)
+    cumsum = price_cumsum(price)
+    short_means = rolling_means(price, short_windows, cumsum)[:, :-1]
+    chunk = max(1, block_size // max(n, 1))
+
+    log_perf = np.full((len(short_windows), len(long_windows)), np.nan)
+    for j in range(0, len(long_windows), chunk):
+        rows = slice(j, j + chunk)
+        long_means = rolling_means(price, long_windows[rows], cumsum)[:, :-1]
+        for i, short_window in enumerate(short_windows):
+            # position is long (+1) when SMA_short > SMA_long and short (-1) otherwise (incl. NaN)
+            longs = (short_means[i] > long_means).astype(float) @ returns[1:]
+            first = np.maximum(np.maximum(long_windows[rows], short_window), 2)
+            valid = first < n
+            log_perf[i, rows] = np.where(valid, 2 * longs - suffix[np.minimum(first, n)], np.nan)
+    return np.exp(log_perf)
+
+
+def sma_metrics(returns, SMA_short, SMA_long):
+    ''' Backtests the SMA strategy on raw arrays (log returns and both moving averages) exactly
+        like test_strategy(), without building the results frame.
+
+    Returns the absolute performance, the outperformance and the number of trades.
+    '''
+    valid = ~(np.isnan(returns) | np.isnan(SMA_short) | np.isnan(SMA_long))
+    first = valid.argmax() # NaNs only precede the first complete row
+    if not valid[first] or len(returns) - first < 2:
+        return np.nan, np.nan, 0
+    position = np.where(SMA_short[first:] > SMA_long[first:], 1.0, -1.0)
+    returns = returns[first + 1:]
+
+    performance = np.exp(position[:-1] @ returns)
+    outperformance = performance - np.exp(returns.sum())
+    trades = np.abs(np.diff(position[1:])).sum()
+    return round(performance, 6), round(outperformance, 6), trades
+
+
+def sma_objective(price):
+    ''' Returns objective(combination, fraction) for the adaptive searches, which backtests a
+        (SMA_short, SMA_long) pair on the first "fraction" of "price". Moving averages are
+        computed once per window and shared by all combinations.
+    '''
+    price = np.asarray(price, dtype = float)
+    returns = np.full(len(price), np.nan)
+    returns[1:] = np.log(price[1:] / price[:-1])
+    means = {}
+
+    def objective(combination, fraction = 1.0):
+        for window in combination:
+            if window not in means:
+                means[window] = rolling_means(price, [window])[0]
+        end = int(round(len(price) * fraction))
+        SMA_short, SMA_long = combination
+        return sma_metrics(returns[:end], means[SMA_short][:end], means[SMA_long][:end])[0]
+
+    return objective
+
 
 class SMAStrategy():
 
@@ -13,6 +114,7 @@ class SMAStrategy():
         self.start = start
         self.end = end
         self.results = None
+        self.evaluated = False # results frame still to build for plot_results()
         self.get_data()
         self.prepare_data()
 
@@ -22,9 +124,7 @@ class SMAStrategy():
     def get_data(self):
         ''' Imports the data from the specified source
         '''
-        data = pd.read_csv("eurusd.csv", parse_dates = ["Date"], index_col = "Date").dropna()
-        data[self.ticker].to_frame().dropna()
-        data = data.loc[self.start:self.end].copy()
+        data = read_columns("eurusd.csv", [self.ticker], self.start, self.end).dropna()
         data.rename(columns = {self.ticker: "price"}, inplace = True)
         data["returns"] = np.log(data.price.div(data.price.shift(1)))
         self.data = data
@@ -59,37 +159,74 @@ class SMAStrategy():
         data["creturns"] = data["returns"].cumsum().apply(np.exp)
         data["cstrategy"] = data["strategy"].cumsum().apply(np.exp)
         self.results = data
+        self.evaluated = False
        
         performance = data["cstrategy"].iloc[-1] # absolute performance of the strategy
         outperformance = performance - data["creturns"].iloc[-1] # out-/underperformance of strategy
         
         return round(performance, 6), round(outperformance, 6)
 
+    def evaluate(self):
+        ''' Backtests the SMA-based trading strategy on the raw arrays (no results frame).
+
+        Returns the absolute performance, the outperformance and the number of trades.
+        '''
+        metrics = sma_metrics(
+            self.data["returns"].to_numpy(),
+            self.data["SMA_short"].to_numpy(),
+            self.data["SMA_long"].to_numpy()
+        )
+        self.results = None
+        self.evaluated = True
+        return metrics
+
     def plot_results(self):
         ''' Plots the performance of the SMA trading strategy and compares to "buy and hold".
         '''
+        if self.results is None and self.evaluated:
+            self.test_strategy() # builds the results frame of the last evaluate()
         if self.results is None:
             print("Run test_strategy() first.")
         else:
+            pyplot()
             title = f"{self.ticker} | SMA short = {self.SMA_short} | SMA long = {self.SMA_long}"
             self.results[["creturns", "cstrategy"]].plot(title = title, figsize = (12, 8))     
 
-    def optimize_parameters(self, SMA_short_range, SMA_long_range):
+    def optimize_parameters(self, SMA_short_range, SMA_long_range, search = "grid", budget = None, seed = None):
         ''' Finds the optimal strategy given the SMA parameters.
 
         Parameters
         ----------
         SMA_short_range, SMA_long_range: int
             tuples of the form (start, end, step size)        
+        search: str
+            "grid" (every combination), "random", "halving" (successive halving on growing
+            data prefixes) or "tpe" (tree-structured Parzen estimator)
+        budget: int
+            number of full backtests of the adaptive searches (defaults to 10% of the grid)
+        seed: int
+            seed of the adaptive searches
         '''
         
-        combinations = list(product(range(*SMA_short_range), range(*SMA_long_range)))
-        
-        # test all combinations
-        results = []
-        for combination in combinations:
-            self.set_parameters(combination[0], combination[1])
-            results.append(self.test_strategy()[0])
+        SMA_short_windows = range(*SMA_short_range)
+        SMA_long_windows = range(*SMA_long_range)
+
+        if search == "grid":
+            combinations = list(product(SMA_short_windows, SMA_long_windows))
+            # test all combinations at once
+            performance = grid_performance(self.data["price"].values, SMA_short_windows, SMA_long_windows)
+            results = list(np.round(performance.ravel(), 6))
+        else:
+            if budget is None:
+                budget = max(1, len(SMA_short_windows) * len(SMA_long_windows) // 10)
+            combinations, performance = adaptive_search(
+                search,
+                [SMA_short_windows, SMA_long_windows],
+                sma_objective(self.data["price"].values),
+                budget,
+                seed
+            )
+            results = list(np.round(performance, 6))
 
         best_performance = np.max(results) # best performance
         optimal_parameters = combinations[np.argmax(results)] # optimal parameters
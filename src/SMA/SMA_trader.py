@@ -1,8 +1,17 @@
 import pandas as pd
-import numpy as np
 import tpqoa
 from datetime import datetime, timedelta
 import time
+from time import perf_counter_ns
+from functools import partial
+from src.Live.Tick_Buffer import TickBuffer
+from src.Live.Bar_History import BarHistory
+from src.Live.Candle_Cache import CandleCache
+from src.Live.Order_Executor import OrderExecutor
+from src.Live.Latency import LatencyRecorder
+from src.Live.Trade_Journal import TradeJournal
+from src.Live.Snapshot import TraderSnapshot
+from src.Live.Incremental_Indicators import SMACrossover
 
 
 class SMATrader(tpqoa.tpqoa):
@@ -13,152 +22,180 @@ class SMATrader(tpqoa.tpqoa):
         bar_length,
         SMA_short,
         SMA_long,
-        units
+        units,
+        history_margin=50,
+        history_file=None,
+        cache_dir=None,
+        latency_report=None,
+        journal_file=None,
+        summary_interval=None,
+        snapshot_file=None,
+        snapshot_interval=60
     ):
         super().__init__(conf_file)
         self.instrument = instrument
         self.bar_length = pd.to_timedelta(bar_length)
-        self.tick_data = pd.DataFrame()
-        self.raw_data = None
-        self.data = None
+        self.tick_data = TickBuffer()
+        self.history = BarHistory(SMA_long + history_margin, history_file)
+        self.candles = CandleCache(cache_dir)
+        self.signal = 0
+        self.last_signal_bar = None
         self.last_bar = None
         self.units = units
         self.position = 0
         self.profits = []
+        self.executor = OrderExecutor(self.create_order)
+        self.pending_order = None
+        self.latency = LatencyRecorder(latency_report)
+        self.journal = TradeJournal(journal_file, summary_interval)
+        self.snapshot = None if snapshot_file is None else TraderSnapshot(snapshot_file, snapshot_interval)
         self.SMA_short = SMA_short
         self.SMA_long = SMA_long
+        self.indicators = SMACrossover(SMA_short, SMA_long)
+
+    @property
+    def raw_data(self):
+        return self.history.data
+
+    @property
+    def parameters(self):
+        # strategy parameters a snapshot has to match to be restored
+        return {"SMA_short": self.SMA_short, "SMA_long": self.SMA_long}
 
     def get_most_recent(self, days=5):
+        # a recent snapshot only needs the bars completed since it was taken
+        if self.snapshot is not None and self.snapshot.restore(self):
+            return
         while True:
-            time.sleep(2)
             now = datetime.utcnow()
             now = now - timedelta(microseconds=now.microsecond)
             past = now - timedelta(days=days)
-            df = self.get_history(
-                instrument=self.instrument,
+            df = self.candles.update(
+                self,
+                self.instrument,
                 start=past,
                 end=now,
                 granularity="S5",
-                price="M",
-                localize=False
-            ).c.dropna().to_frame()
-            df.rename(columns={"c": self.instrument}, inplace=True)
+                price="M"
+            ).to_frame(self.instrument)
             df = df.resample(
                 self.bar_length,
                 label="right"
             ).last().dropna().iloc[:-1]
-            self.raw_data = df.copy()
-            self.last_bar = self.raw_data.index[-1]
+            self.load_history(df)
             if pd.to_datetime(
                 datetime.utcnow()
             ).tz_localize("UTC") - self.last_bar < self.bar_length:
                 break
+            time.sleep(2)
+
+    def load_history(self, bars):
+        self.history.reset(bars)
+        self.last_bar = self.raw_data.index[-1]
 
     def on_success(self, time, bid, ask):
-        print(self.ticks, end=" ")
-
-        recent_tick = pd.to_datetime(time)
-        df = pd.DataFrame(
-            {
-                self.instrument: (ask + bid)/2
-            },
-            index=[recent_tick]
-        )
-        self.tick_data = self.tick_data.append(df)
+        self.journal.tick()
+
+        self.latency.start()
+        recent_tick = pd.Timestamp(time)
+        self.tick_data.append(recent_tick.value, (ask + bid)/2)
+        self.latency.lap("tick_ingest")
 
         if recent_tick - self.last_bar > self.bar_length:
             self.resample_and_join()
+            self.latency.lap("resample_and_join")
             self.define_strategy()
+            self.latency.lap("define_strategy")
             self.execute_trades()
+            self.latency.lap("execute_trades")
+            if self.snapshot is not None:
+                self.snapshot.maybe_save(self)
+        self.latency.maybe_report()
 
     def resample_and_join(self):
-        self.raw_data = self.raw_data.append(self.tick_data.resample(
-            self.bar_length, label="right"
-        ).last().ffill().iloc[:-1])
-        self.tick_data = self.tick_data.iloc[-1:]
+        self.history.extend(
+            self.tick_data.bars_frame(self.bar_length, self.instrument)
+        )
+        self.tick_data.keep_last(1)
         self.last_bar = self.raw_data.index[-1]
 
+    def on_bar(self, instrument, bar):
+        # closed bar of a shared BarAggregator (replaces on_success when the engine builds the bars)
+        if bar.time <= self.last_bar:
+            return
+        self.latency.start()
+        self.history.extend(
+            pd.DataFrame({self.instrument: [bar.close]}, index=[bar.time])
+        )
+        self.last_bar = bar.time
+        self.latency.lap("resample_and_join")
+        self.define_strategy()
+        self.latency.lap("define_strategy")
+        self.execute_trades()
+        self.latency.lap("execute_trades")
+        if self.snapshot is not None:
+            self.snapshot.maybe_save(self)
+        self.latency.maybe_report()
+
     def define_strategy(self):  # "strategy-specific"
-        df = self.raw_data.copy()
+        # only the bars added since the last call update the indicator state
+        closes = self.raw_data[self.instrument]
+        if self.last_signal_bar is not None:
+            closes = closes.iloc[
+                closes.index.searchsorted(self.last_signal_bar, side="right"):
+            ]
 
         # ******************** define your strategy here **********************
-        df["SMA_short"] = df[self.instrument].rolling(self.SMA_short).mean()
-        df["SMA_long"] = df[self.instrument].rolling(self.SMA_long).mean()
-        df["position"] = np.where(df["SMA_short"] > df["SMA_long"], 1, -1)
+        for price in closes.values:
+            self.signal = self.indicators.update(price)
         # *********************************************************************
 
-        self.data = df.copy()
+        self.last_signal_bar = self.raw_data.index[-1]
 
     def execute_trades(self):
-        if self.data["position"].iloc[-1] == 1:
-            if self.position == 0:
-                order = self.create_order(
-                    self.instrument,
-                    self.units,
-                    suppress=True,
-                    ret=True
-                )
-                self.report_trade(order, "GOING LONG")
-            elif self.position == -1:
-                order = self.create_order(
-                    self.instrument,
-                    self.units * 2,
-                    suppress=True,
-                    ret=True
-                )
-                self.report_trade(order, "GOING LONG")
-            self.position = 1
-        elif self.data["position"].iloc[-1] == -1:
-            if self.position == 0:
-                order = self.create_order(
-                    self.instrument,
-                    -self.units,
-                    suppress=True,
-                    ret=True
+        # orders are sent by the executor; wait for a pending one before deciding again
+        if self.pending_order is not None:
+            if not self.pending_order.done():
+                return
+            error = self.pending_order.exception()
+            if error is not None:
+                # a failed order is reported once, then sent again if the signal still differs
+                print(f"Order failed: {error!r}")
+                self.journal.record(pd.Timestamp.now(tz="UTC"), self.instrument, f"ORDER FAILED ({error!r})")
+            self.pending_order = None
+        if self.signal != self.position:
+            going = {
+                1: "GOING LONG",
+                -1: "GOING SHORT",
+                0: "GOING NEUTRAL"
+            }[self.signal]
+            # a reversal (e.g. from -1 to 1) is a single order of units * 2
+            self.pending_order = self.executor.submit(
+                self.instrument,
+                (self.signal - self.position) * self.units,
+                on_fill=partial(
+                    self.on_fill,
+                    position=self.signal,
+                    going=going,
+                    submitted=perf_counter_ns()
                 )
-                self.report_trade(order, "GOING SHORT")
-            elif self.position == 1:
-                order = self.create_order(
-                    self.instrument,
-                    -self.units * 2,
-                    suppress=True,
-                    ret=True
-                )
-                self.report_trade(order, "GOING SHORT")
-            self.position = -1
-        elif self.data["position"].iloc[-1] == 0:
-            if self.position == -1:
-                order = self.create_order(
-                    self.instrument,
-                    self.units,
-                    suppress=True,
-                    ret=True
-                )
-                self.report_trade(order, "GOING NEUTRAL")
-            elif self.position == 1:
-                order = self.create_order(
-                    self.instrument,
-                    -self.units,
-                    suppress=True,
-                    ret=True
-                )
-                self.report_trade(order, "GOING NEUTRAL")
-            self.position = 0
+            )
+            self.latency.elapsed("tick_to_order")
+
+    def on_fill(self, order, position, going, submitted):
+        self.latency.record("order_round_trip", perf_counter_ns() - submitted)
+        self.position = position
+        self.report_trade(order, going)
 
     def report_trade(self, order, going):
-        time = order["time"]
-        units = order["units"]
-        price = order["price"]
         pl = float(order["pl"])
         self.profits.append(pl)
-        cumpl = sum(self.profits)
-        print("\n" + 100 * "-")
-        print("{} | {}".format(time, going))
-        print(
-            "{} | \
-            units = {} | \
-            price = {} | \
-            P&L = {} | \
-            Cum P&L = {}".format(time, units, price, pl, cumpl)
+        # the journal keeps the cumulative P&L and writes the record from its own thread
+        self.journal.trade(
+            self.instrument,
+            order["time"],
+            going,
+            order["units"],
+            order["price"],
+            pl
         )
-        print(150 * "-" + "\n")